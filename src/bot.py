@@ -1,12 +1,19 @@
+import asyncio
 import logging
-from telegram import Update
+import time
+from datetime import timedelta
+from typing import AsyncIterator
+
+from telegram import Message, Update
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 
 from src.config import config
+from src.metrics import HANDLE_MESSAGE_SECONDS
 from src.nlu.processor import classify_intent_and_extract_entities
 from src.services.unleashnfts_api import unleash_nfts_service
 from src.services.gemini_ai import gemini_service
-from src.database.manager import db_manager
+from src.database.manager import UnitOfWork, db_manager
 from src.scheduler import check_price_alerts
 
 # Enable logging
@@ -28,17 +35,126 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_html(welcome_message)
 
 
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+async def _edit(message: Message, text: str, final: bool = False) -> bool:
+    """Edits a message, ignoring no-op edits. Intermediate edits are skipped when rate limited."""
+    try:
+        await message.edit_text(text)
+        return True
+    except BadRequest as e:
+        if "not modified" in str(e).lower():
+            return True
+        logger.warning(f"Could not edit streamed message: {e}")
+    except RetryAfter as e:
+        if final:
+            retry_after = e.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            await asyncio.sleep(retry_after)
+            return await _edit(message, text)
+    return False
+
+
+async def stream_to_message(
+    reply_to: Message, placeholder: Message, chunks: AsyncIterator[str], edit_interval: float = None
+) -> str:
+    """
+    Progressively edits `placeholder` with text streamed from `chunks`.
+
+    Edits are throttled to one per `edit_interval` seconds; the final edit
+    always carries the full text. Text beyond Telegram's message limit is sent
+    as follow-up replies. Returns the full text.
+    """
+    edit_interval = config.SUMMARY_EDIT_INTERVAL_SECONDS if edit_interval is None else edit_interval
+    text = ""
+    shown = ""
+    last_edit = 0.0
+    async for chunk in chunks:
+        text += chunk
+        now = time.monotonic()
+        if now - last_edit >= edit_interval and len(text) <= TELEGRAM_MESSAGE_LIMIT and text.strip():
+            if await _edit(placeholder, text):
+                shown = text
+            last_edit = now
+
+    if not text.strip():
+        return text
+    head, rest = text[:TELEGRAM_MESSAGE_LIMIT], text[TELEGRAM_MESSAGE_LIMIT:]
+    if head != shown and not await _edit(placeholder, head, final=True):
+        # The placeholder could not be edited; deliver the summary as a new message.
+        await reply_to.reply_text(head)
+    for i in range(0, len(rest), TELEGRAM_MESSAGE_LIMIT):
+        await reply_to.reply_text(rest[i:i + TELEGRAM_MESSAGE_LIMIT])
+    return text
+
+
+async def resolve_collection(collection_name: str) -> tuple[dict | None, bool]:
+    """
+    Finds the collection a user means, cheapest source first:
+
+    1. the in-memory collection index (no I/O; the collection row is linked
+       later, only if an alert is created),
+    2. an alias recorded the last time someone typed the same words,
+    3. the live UnleashNFTs search.
+
+    Returns `(collection, searched)`. The alias lookup's session is closed
+    before the live search, so no connection is held during it; a searched
+    match should be saved with `record_collection` in the caller's unit of
+    work.
+    """
+    collection = unleash_nfts_service.collection_index.lookup(collection_name)
+    if collection:
+        return collection, False
+    collection = await db_manager.find_collection(collection_name)
+    if collection:
+        return collection, False
+    collection = await unleash_nfts_service.search_collection(collection_name)
+    return collection, collection is not None
+
+
+async def record_collection(collection_name: str, collection: dict, uow: UnitOfWork = None) -> dict:
+    """Saves a searched collection and the alias the user typed for it, so the next lookup is a cache hit."""
+    metadata = collection["metadata"]
+    collection_id = await db_manager.get_or_create_collection(
+        metadata["chain_id"], metadata["contract_address"], metadata["name"], metadata, uow=uow
+    )
+    await db_manager.add_collection_alias(collection_name, collection_id, uow=uow)
+    return {**collection, "collection_id": collection_id}
+
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handles all non-command messages by routing them through the NLU processor."""
-    user_input = update.message.text
-    nlu_result = await classify_intent_and_extract_entities(user_input)
-    
+    started = time.perf_counter()
+    intent = "error"
+    try:
+        user_input = update.message.text
+        # The user lookup does not depend on the classification, so run them together.
+        nlu_result, user = await asyncio.gather(
+            classify_intent_and_extract_entities(user_input),
+            db_manager.get_or_create_user(
+                telegram_user_id=update.effective_user.id,
+                first_name=update.effective_user.first_name
+            ),
+        )
+        intent = nlu_result.get('intent') or "unknown"
+        await route_intent(update, context, nlu_result, user)
+    finally:
+        HANDLE_MESSAGE_SECONDS.labels(intent=intent).observe(time.perf_counter() - started)
+
+
+async def route_intent(update: Update, context: ContextTypes.DEFAULT_TYPE, nlu_result: dict, user) -> None:
+    """
+    Carries out the classified intent for `user`.
+
+    Database work runs in short units of work that are committed before any
+    Telegram reply or slow external call (collection search, metrics, Gemini),
+    so no connection is held while waiting on them. Recording a searched
+    collection and creating the alert share one unit of work.
+    """
     intent = nlu_result.get('intent')
     entities = nlu_result.get('entities', {})
-    user = await db_manager.get_or_create_user(
-        telegram_user_id=update.effective_user.id,
-        first_name=update.effective_user.first_name
-    )
 
     if intent == 'get_project_summary':
         collection_name = entities.get('collection_name')
@@ -47,7 +163,10 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             return
 
         await update.message.reply_text(f"Searching for {collection_name}...")
-        collection = await unleash_nfts_service.search_collection(collection_name)
+        collection, searched = await resolve_collection(collection_name)
+        if searched:
+            async with db_manager.unit_of_work() as uow:
+                collection = await record_collection(collection_name, collection, uow)
 
         if not collection:
             await update.message.reply_text(f"I couldn't find a collection named {collection_name}. Please try another name.")
@@ -56,7 +175,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         collection_address = collection["metadata"]["contract_address"]
         blockchain = collection["metadata"]["chain_id"]
         
-        await update.message.reply_text(f"Fetching summary for {collection['metadata']['name']}...")
+        placeholder = await update.message.reply_text(f"Fetching summary for {collection['metadata']['name']}...")
 
         collection_data = await unleash_nfts_service.get_collection_metrics(blockchain, collection_address)
         
@@ -64,8 +183,14 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             await update.message.reply_text("I'm sorry, I couldn't retrieve data for that collection.")
             return
 
-        summary = await gemini_service.generate_summary(collection_data)
-        await update.message.reply_text(summary)
+        if config.SUMMARY_STREAMING:
+            chunks = gemini_service.stream_summary(collection_data, chain=blockchain, address=collection_address)
+            await stream_to_message(update.message, placeholder, chunks)
+        else:
+            summary = await gemini_service.generate_summary(
+                collection_data, chain=blockchain, address=collection_address
+            )
+            await update.message.reply_text(summary)
 
     elif intent == 'set_price_alert':
         collection_name = entities.get('collection_name')
@@ -77,24 +202,26 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             return
 
         await update.message.reply_text(f"Searching for {collection_name}...")
-        collection = await unleash_nfts_service.search_collection(collection_name)
+        collection, searched = await resolve_collection(collection_name)
+        if collection:
+            # Recording a searched collection and creating the alert share one transaction.
+            async with db_manager.unit_of_work() as uow:
+                if searched:
+                    collection = await record_collection(collection_name, collection, uow)
+                alert_data = {
+                    "collection_name": collection['metadata']['name'],
+                    "collection_address": collection["metadata"]["contract_address"],
+                    "chain": str(collection["metadata"]["chain_id"]),
+                    "collection_id": collection.get("collection_id"),
+                    "threshold_price": threshold_price,
+                    "direction": direction
+                }
+                await db_manager.create_price_alert(user, alert_data, uow=uow)
 
         if not collection:
             await update.message.reply_text(f"I couldn't find a collection named {collection_name}. Please try another name.")
             return
 
-        collection_address = collection["metadata"]["contract_address"]
-        chain = collection["metadata"]["chain_id"]
-        
-        alert_data = {
-            "collection_name": collection['metadata']['name'],
-            "collection_address": collection_address,
-            "chain": str(chain),
-            "threshold_price": threshold_price,
-            "direction": direction
-        }
-        
-        await db_manager.create_price_alert(user, alert_data)
         await update.message.reply_text(f"✅ Alert set! I'll notify you if {collection['metadata']['name']} goes {direction} {threshold_price} ETH.")
 
     elif intent == 'set_new_listing_alert':
@@ -110,7 +237,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             "chain": "ethereum",  # Placeholder
         }
 
-        await db_manager.create_new_listing_alert(user, alert_data)
+        async with db_manager.unit_of_work() as uow:
+            await db_manager.create_new_listing_alert(user, alert_data, uow=uow)
         await update.message.reply_text(f"✅ Alert set! I'll notify you when there are new listings for {collection_name}.")
 
     elif intent == 'track_wallet':
@@ -120,7 +248,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             await update.message.reply_text("I'm sorry, I couldn't identify the wallet address. Please try again.")
             return
 
-        await db_manager.create_tracked_wallet(user, wallet_address)
+        async with db_manager.unit_of_work() as uow:
+            await db_manager.create_tracked_wallet(user, wallet_address, uow=uow)
         await update.message.reply_text(f"✅ Wallet tracking enabled! I'll monitor {wallet_address} for NFT activity.")
 
     elif intent == 'get_market_trends':
@@ -139,9 +268,28 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await update.message.reply_text(response_text)
 
 
+async def post_init(application: Application) -> None:
+    """Opens long-lived resources once the application has been initialized."""
+    await unleash_nfts_service.start()
+    unleash_nfts_service.start_index_refresh()
+    gemini_service.start_prewarm(unleash_nfts_service.get_collection_metrics)
+
+
+async def post_shutdown(application: Application) -> None:
+    """Releases long-lived resources when the application shuts down."""
+    await gemini_service.stop_prewarm()
+    await unleash_nfts_service.close()
+
+
 def create_app() -> Application:
     """Creates and configures the Telegram bot application."""
-    application = Application.builder().token(config.TELEGRAM_BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(config.TELEGRAM_BOT_TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Add handlers
     application.add_handler(CommandHandler("start", start))
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class TTLCache:
+    """
+    A small LRU cache whose entries expire after a fixed time-to-live.
+
+    `get_or_load` adds single-flight semantics: concurrent callers asking for
+    the same missing key share one call to the loader instead of each
+    issuing their own.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns a fresh cached value, or `default` if missing or expired."""
+        _missing = object()
+        value = self.peek(key, _missing)
+        if value is _missing:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Like `get`, but leaves the hit/miss counters to the caller."""
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """Stores a value, evicting the least recently used entries if full."""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        should_cache: Callable[[Any], bool] = lambda value: value is not None,
+    ) -> Any:
+        """
+        Returns the cached value for `key`, calling `loader` on a miss.
+
+        Only one loader runs per key at a time; other callers await its result.
+        The load runs as its own task, so it finishes (and fills the cache)
+        even if the caller that started it is cancelled. Results rejected by
+        `should_cache` are returned but not stored.
+        """
+        _missing = object()
+        value = self.get(key, _missing)
+        if value is not _missing:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, loader, should_cache))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._loaded(key, done))
+        # The load is shared, so a caller that is cancelled or times out must
+        # only stop waiting, never cancel it for everyone else.
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, loader, should_cache) -> Any:
+        value = await loader()
+        if should_cache(value):
+            self.set(key, value)
+        return value
+
+    def _loaded(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every caller stopped waiting.
+            task.exception()
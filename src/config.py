@@ -14,6 +14,8 @@ class Config:
     DATABASE_URL = os.getenv("DATABASE_URL")
     SCHEDULER_SECRET = os.getenv("SCHEDULER_SECRET")
     WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+    # Path secret for the Prometheus /metrics endpoint; defaults to the scheduler secret
+    METRICS_SECRET = os.getenv("METRICS_SECRET") or SCHEDULER_SECRET
 
     # Basic validation to ensure keys are set
     if not all([TELEGRAM_BOT_TOKEN, BITCRUNCH_API_KEY, GEMINI_API_KEY, DATABASE_URL, SCHEDULER_SECRET, WEBHOOK_URL]):
@@ -31,5 +33,90 @@ class Config:
         # For now, we'll print a warning.
         print(f"⚠️ WARNING: Missing required environment variables: {', '.join(missing)}")
 
+    # --- Optional tuning ---
+    # UnleashNFTs HTTP client (one pooled client is shared for the bot's lifetime)
+    UNLEASH_HTTP_MAX_CONNECTIONS = int(os.getenv("UNLEASH_HTTP_MAX_CONNECTIONS", "20"))
+    UNLEASH_HTTP_MAX_KEEPALIVE = int(os.getenv("UNLEASH_HTTP_MAX_KEEPALIVE", "10"))
+    UNLEASH_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("UNLEASH_HTTP_KEEPALIVE_EXPIRY", "60"))
+    UNLEASH_HTTP_CONNECT_TIMEOUT = float(os.getenv("UNLEASH_HTTP_CONNECT_TIMEOUT", "5"))
+    UNLEASH_HTTP_READ_TIMEOUT = float(os.getenv("UNLEASH_HTTP_READ_TIMEOUT", "15"))
+    UNLEASH_HTTP_POOL_TIMEOUT = float(os.getenv("UNLEASH_HTTP_POOL_TIMEOUT", "5"))
+    UNLEASH_HTTP2 = os.getenv("UNLEASH_HTTP2", "false").lower() == "true"
+
+    # Local collection-name index refreshed in the background from /collections
+    COLLECTION_INDEX_REFRESH_SECONDS = float(os.getenv("COLLECTION_INDEX_REFRESH_SECONDS", "3600"))
+    COLLECTION_INDEX_MAX_PAGES = int(os.getenv("COLLECTION_INDEX_MAX_PAGES", "20"))
+    COLLECTION_INDEX_MIN_SIMILARITY = float(os.getenv("COLLECTION_INDEX_MIN_SIMILARITY", "0.5"))
+
+    # Collection metrics response cache
+    METRICS_CACHE_TTL_SECONDS = float(os.getenv("METRICS_CACHE_TTL_SECONDS", "30"))
+    METRICS_CACHE_MAX_ENTRIES = int(os.getenv("METRICS_CACHE_MAX_ENTRIES", "1024"))
+
+    # Alert scheduler
+    ALERT_FETCH_CONCURRENCY = int(os.getenv("ALERT_FETCH_CONCURRENCY", "10"))
+    ALERT_FETCH_TIMEOUT_SECONDS = float(os.getenv("ALERT_FETCH_TIMEOUT_SECONDS", "20"))
+    ALERT_SCAN_CHUNK_SIZE = int(os.getenv("ALERT_SCAN_CHUNK_SIZE", "1000"))
+
+    # Outbound notification dispatcher (Telegram allows ~30 msg/s overall, ~1 msg/s per chat)
+    NOTIFY_GLOBAL_RATE = float(os.getenv("NOTIFY_GLOBAL_RATE", "30"))
+    NOTIFY_PER_CHAT_RATE = float(os.getenv("NOTIFY_PER_CHAT_RATE", "1"))
+    NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "8"))
+    NOTIFY_MAX_RETRIES = int(os.getenv("NOTIFY_MAX_RETRIES", "3"))
+
+    # Database connection pool (ignored for SQLite)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+    DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+    # Recycle connections before the hosted Postgres drops them for being idle
+    DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "300"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # asyncpg prepared statement cache per connection; set to 0 behind PgBouncer in transaction mode
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+    DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "250"))
+
+    # Cache of telegram_user_id -> user id; the mapping never changes, so the TTL only bounds staleness after a DB reset
+    USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "50000"))
+    USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "86400"))
+
+    # Gemini call governor
+    GEMINI_PRO_CONCURRENCY = int(os.getenv("GEMINI_PRO_CONCURRENCY", "4"))
+    GEMINI_FLASH_CONCURRENCY = int(os.getenv("GEMINI_FLASH_CONCURRENCY", "16"))
+    GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "20"))
+    GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "2"))
+    GEMINI_RETRY_BACKOFF_SECONDS = float(os.getenv("GEMINI_RETRY_BACKOFF_SECONDS", "0.5"))
+    GEMINI_HEDGING_ENABLED = os.getenv("GEMINI_HEDGING_ENABLED", "false").lower() == "true"
+    # Seconds to wait for pro before hedging with flash; 0 uses pro's observed p95 latency
+    GEMINI_HEDGE_AFTER_SECONDS = float(os.getenv("GEMINI_HEDGE_AFTER_SECONDS", "0"))
+
+    # Gemini summaries
+    SUMMARY_CACHE_TTL_SECONDS = float(os.getenv("SUMMARY_CACHE_TTL_SECONDS", "900"))
+    SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "256"))
+    SUMMARY_PREWARM_TOP_N = int(os.getenv("SUMMARY_PREWARM_TOP_N", "10"))
+    SUMMARY_PREWARM_INTERVAL_SECONDS = float(os.getenv("SUMMARY_PREWARM_INTERVAL_SECONDS", "600"))
+    # Collections tracked for pre-generation, and how much their request counts shrink each cycle
+    SUMMARY_POPULARITY_MAX_ENTRIES = int(os.getenv("SUMMARY_POPULARITY_MAX_ENTRIES", "1000"))
+    SUMMARY_POPULARITY_DECAY = float(os.getenv("SUMMARY_POPULARITY_DECAY", "0.5"))
+    # Upper bound on the estimated size of a summary prompt; low-priority fields are dropped to fit
+    SUMMARY_PROMPT_TOKEN_BUDGET = int(os.getenv("SUMMARY_PROMPT_TOKEN_BUDGET", "400"))
+    SUMMARY_STREAMING = os.getenv("SUMMARY_STREAMING", "true").lower() == "true"
+    # Minimum seconds between progressive edits of a streamed summary message
+    SUMMARY_EDIT_INTERVAL_SECONDS = float(os.getenv("SUMMARY_EDIT_INTERVAL_SECONDS", "1.0"))
+
+    # NLU
+    NLU_FAST_PATH_ENABLED = os.getenv("NLU_FAST_PATH_ENABLED", "true").lower() == "true"
+    NLU_FAST_PATH_MIN_CONFIDENCE = float(os.getenv("NLU_FAST_PATH_MIN_CONFIDENCE", "0.9"))
+    NLU_CACHE_MAX_ENTRIES = int(os.getenv("NLU_CACHE_MAX_ENTRIES", "2048"))
+    NLU_CACHE_TTL_SECONDS = float(os.getenv("NLU_CACHE_TTL_SECONDS", "3600"))
+    NLU_TIERED_ROUTING = os.getenv("NLU_TIERED_ROUTING", "true").lower() == "true"
+    NLU_ESCALATION_CONFIDENCE = float(os.getenv("NLU_ESCALATION_CONFIDENCE", "0.8"))
+    NLU_CACHE_TEMPLATE_ENTITIES = os.getenv("NLU_CACHE_TEMPLATE_ENTITIES", "true").lower() == "true"
+    NLU_BATCHING_ENABLED = os.getenv("NLU_BATCHING_ENABLED", "false").lower() == "true"
+    NLU_BATCH_MAX_SIZE = int(os.getenv("NLU_BATCH_MAX_SIZE", "16"))
+    NLU_BATCH_MAX_WAIT_MS = float(os.getenv("NLU_BATCH_MAX_WAIT_MS", "30"))
+    # Distilled local intent model (see src/nlu/local_model.py)
+    NLU_LABEL_LOG_PATH = os.getenv("NLU_LABEL_LOG_PATH", "")
+    NLU_LOCAL_MODEL_PATH = os.getenv("NLU_LOCAL_MODEL_PATH", "nlu_local_model.json")
+    NLU_LOCAL_MODEL_MIN_CONFIDENCE = float(os.getenv("NLU_LOCAL_MODEL_MIN_CONFIDENCE", "0.9"))
+
 # Instantiate config
 config = Config()
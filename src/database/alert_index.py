@@ -0,0 +1,166 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+from src.database.models import normalize_chain
+
+
+class _ThresholdSide:
+    """Thresholds for one direction of one collection, sorted ascending with their alert ids."""
+
+    __slots__ = ("thresholds", "ids")
+
+    def __init__(self):
+        self.thresholds = array("d")
+        self.ids = array("q")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(self, threshold: float, alert_id: int):
+        """Appends without keeping order; call `sort` once bulk loading is done."""
+        self.thresholds.append(threshold)
+        self.ids.append(alert_id)
+
+    def sort(self):
+        order = sorted(range(len(self.ids)), key=self.thresholds.__getitem__)
+        self.thresholds = array("d", (self.thresholds[i] for i in order))
+        self.ids = array("q", (self.ids[i] for i in order))
+
+    def insert(self, threshold: float, alert_id: int):
+        i = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(i, threshold)
+        self.ids.insert(i, alert_id)
+
+    def discard(self, alert_ids: set):
+        keep = [i for i, alert_id in enumerate(self.ids) if alert_id not in alert_ids]
+        self.thresholds = array("d", (self.thresholds[i] for i in keep))
+        self.ids = array("q", (self.ids[i] for i in keep))
+
+
+class _CollectionAlerts:
+    __slots__ = ("chain", "address", "above", "below")
+
+    def __init__(self, chain: str, address: str):
+        self.chain = chain
+        self.address = address
+        self.above = _ThresholdSide()
+        self.below = _ThresholdSide()
+
+    def __len__(self) -> int:
+        return len(self.above) + len(self.below)
+
+
+class AlertIndex:
+    """
+    In-memory index of active price alerts, grouped by collection.
+
+    Each collection keeps its `above` and `below` thresholds in sorted compact
+    arrays, so the alerts triggered by a floor price are found with a binary
+    search and a slice instead of comparing every alert.
+
+    Collections are keyed by their `collections` row id. Alerts not yet
+    linked to a collection row fall back to a (chain id, lowercased address)
+    key.
+
+    The database remains the source of truth: the scheduler rebuilds the
+    index from it at the start of every run. Between rebuilds it is kept
+    current with the alerts this process creates and deactivates.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._collections: dict[int | tuple, _CollectionAlerts] = {}
+        self._locations: dict[int, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    @staticmethod
+    def collection_key(chain: str, address: str, collection_id: int = None):
+        if collection_id is not None:
+            return collection_id
+        return (normalize_chain(chain), address.lower())
+
+    def add(self, alert_id: int, chain: str, address: str, direction: str, threshold_price: float,
+            collection_id: int = None):
+        """Adds (or replaces) an active alert."""
+        if direction not in ("above", "below"):
+            return
+        if alert_id in self._locations:
+            self.remove([alert_id])
+        key = self.collection_key(chain, address, collection_id)
+        collection = self._collections.get(key)
+        if collection is None:
+            collection = self._collections[key] = _CollectionAlerts(chain, address)
+        getattr(collection, direction).insert(float(threshold_price), alert_id)
+        self._locations[alert_id] = (key, direction)
+
+    def remove(self, alert_ids):
+        """Removes alerts, e.g. after they have been deactivated."""
+        affected: dict[tuple, set] = {}
+        for alert_id in alert_ids:
+            location = self._locations.pop(alert_id, None)
+            if location is not None:
+                affected.setdefault(location, set()).add(alert_id)
+        for (key, direction), ids in affected.items():
+            collection = self._collections[key]
+            getattr(collection, direction).discard(ids)
+            if not len(collection):
+                del self._collections[key]
+
+    def rebuild(self, rows):
+        """
+        Replaces the index contents.
+
+        Args:
+            rows: Iterable of (alert_id, chain, collection_address, direction,
+                threshold_price[, collection_id]).
+        """
+        self._collections = {}
+        self._locations = {}
+        self.loaded = False
+        self.load(rows)
+        self.finalize()
+
+    def load(self, rows):
+        """
+        Bulk-loads a chunk of rows without sorting, so a rebuild can be fed one
+        streamed chunk at a time. Call `finalize` after the last chunk.
+        """
+        for alert_id, chain, address, direction, threshold_price, *collection_id in rows:
+            if direction not in ("above", "below") or alert_id in self._locations:
+                continue
+            key = self.collection_key(chain, address, *collection_id)
+            collection = self._collections.get(key)
+            if collection is None:
+                collection = self._collections[key] = _CollectionAlerts(chain, address)
+            getattr(collection, direction).append(float(threshold_price), alert_id)
+            self._locations[alert_id] = (key, direction)
+
+    def finalize(self):
+        """Sorts every collection's thresholds after bulk loading and marks the index loaded."""
+        for collection in self._collections.values():
+            collection.above.sort()
+            collection.below.sort()
+        self.loaded = True
+
+    def collections(self) -> list[tuple]:
+        """Returns (key, chain, address) for every collection with active alerts."""
+        return [(key, c.chain, c.address) for key, c in self._collections.items()]
+
+    def alert_count(self, key) -> int:
+        collection = self._collections.get(key)
+        return len(collection) if collection else 0
+
+    def triggered(self, key, floor_price: float) -> list[int]:
+        """Returns ids of alerts on a collection triggered by the given floor price."""
+        collection = self._collections.get(key)
+        if collection is None:
+            return []
+        # 'below' alerts fire when floor < threshold: every threshold strictly above the floor.
+        below = collection.below
+        triggered = list(below.ids[bisect_right(below.thresholds, floor_price):])
+        # 'above' alerts fire when floor > threshold: every threshold strictly below the floor.
+        above = collection.above
+        triggered.extend(above.ids[:bisect_left(above.thresholds, floor_price)])
+        return triggered
@@ -1,8 +1,10 @@
+import argparse
 import asyncio
 from src.database.manager import db_manager
+from src.database.migrations import migrate
 from src.database.models import Base
 
-async def create_tables():
+async def reset_tables():
     """Connects to the database, drops all existing tables, and creates new ones."""
     print("Connecting to the database to re-create tables...")
     async with db_manager.engine.begin() as conn:
@@ -14,5 +16,16 @@ async def create_tables():
         await conn.run_sync(Base.metadata.create_all)
     print("Tables re-created successfully.")
 
+async def migrate_tables():
+    """Creates missing tables and indexes, keeping existing data."""
+    print("Connecting to the database to apply migrations...")
+    created = await migrate(db_manager.engine)
+    if created:
+        print(f"Created indexes: {', '.join(created)}")
+    print("Schema is up to date.")
+
 if __name__ == "__main__":
-    asyncio.run(create_tables())
+    parser = argparse.ArgumentParser(description="Create or update the database schema.")
+    parser.add_argument("--reset", action="store_true", help="Drop every table and re-create it (deletes all data).")
+    args = parser.parse_args()
+    asyncio.run(reset_tables() if args.reset else migrate_tables())
@@ -1,72 +1,462 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from contextlib import asynccontextmanager
+
+from sqlalchemy import func, insert, text, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.future import select
 
+from src.cache import TTLCache
 from src.config import config
-from src.database.models import Base, User, PriceAlert, NewListingAlert, TrackedWallet
+from src.database.alert_index import AlertIndex
+from src.database.migrations import migrate
+from src.database.telemetry import DatabaseTelemetry, timed_pool_class
+from src.database.models import Collection, CollectionAlias, User, PriceAlert, NewListingAlert, TrackedWallet, normalize_chain
+from src.services.collection_index import normalize_name
+
+class UnitOfWork:
+    """A session inside one transaction, plus callbacks to run once it commits."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self._on_commit = []
+
+    def after_commit(self, callback):
+        self._on_commit.append(callback)
+
+    def committed(self):
+        callbacks, self._on_commit = self._on_commit, []
+        for callback in callbacks:
+            callback()
+
+# Dialects supporting INSERT ... ON CONFLICT DO NOTHING RETURNING.
+_DIALECT_INSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+def _engine_options(db_url: str, telemetry: DatabaseTelemetry) -> dict:
+    """Pool settings from Config; SQLite keeps SQLAlchemy's defaults (it has no server to pool)."""
+    if db_url.startswith("sqlite"):
+        return {}
+    options = {
+        "poolclass": timed_pool_class(telemetry),
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": config.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+    if "+asyncpg" in db_url:
+        options["connect_args"] = {"prepared_statement_cache_size": config.DB_STATEMENT_CACHE_SIZE}
+    return options
 
 class DatabaseManager:
     def __init__(self, db_url: str):
-        self.engine = create_async_engine(db_url)
+        self.telemetry = DatabaseTelemetry()
+        self.engine = create_async_engine(db_url, **_engine_options(db_url, self.telemetry))
+        self.telemetry.instrument(self.engine.sync_engine)
         self.async_session = sessionmaker(
             self.engine, expire_on_commit=False, class_=AsyncSession
         )
+        self.alert_index = AlertIndex()
+        # Index changes made while a rebuild is scanning, replayed onto the new index.
+        self._index_changes: list[tuple] | None = None
+        self.user_ids = TTLCache(maxsize=config.USER_CACHE_MAX_ENTRIES, ttl=config.USER_CACHE_TTL_SECONDS)
+
+    def pool_stats(self) -> dict:
+        """Connections checked out, overflow, checkout waits and query timings."""
+        return self.telemetry.stats()
 
     async def init_db(self):
-        async with self.engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+        await migrate(self.engine)
 
     async def get_or_create_user(self, telegram_user_id: int, first_name: str) -> User:
+        """
+        Returns the user for a Telegram account, creating it on first contact.
+
+        Known users are answered from an in-process LRU of telegram_user_id ->
+        user id without touching the database, so the returned User is a
+        detached object carrying the id, Telegram id and current first name.
+        Unknown users cost one upsert statement.
+        """
+        user_id = await self.user_ids.get_or_load(
+            telegram_user_id, lambda: self._upsert_user(telegram_user_id, first_name)
+        )
+        return User(id=user_id, telegram_user_id=telegram_user_id, first_name=first_name)
+
+    async def _upsert_user(self, telegram_user_id: int, first_name: str) -> int:
+        """INSERT ... ON CONFLICT DO NOTHING RETURNING id, falling back to a SELECT for existing users."""
+        insert = _DIALECT_INSERTS.get(self.engine.dialect.name)
         async with self.async_session() as session:
-            result = await session.execute(
-                select(User).filter_by(telegram_user_id=telegram_user_id)
-            )
-            user = result.scalar_one_or_none()
-            if not user:
+            if insert is not None:
+                user_id = await session.scalar(
+                    insert(User)
+                    .values(telegram_user_id=telegram_user_id, first_name=first_name)
+                    .on_conflict_do_nothing(index_elements=[User.telegram_user_id])
+                    .returning(User.id)
+                )
+                await session.commit()
+                if user_id is not None:
+                    return user_id
+
+            user_id = await session.scalar(select(User.id).filter_by(telegram_user_id=telegram_user_id))
+            if user_id is None:
                 user = User(telegram_user_id=telegram_user_id, first_name=first_name)
                 session.add(user)
                 await session.commit()
-                await session.refresh(user)
-            return user
+                user_id = user.id
+            return user_id
+
+    @asynccontextmanager
+    async def unit_of_work(self):
+        """
+        Opens one session and one transaction for a handler's database work.
 
-    async def create_price_alert(self, user: User, alert_data: dict) -> PriceAlert:
+        Pass the yielded UnitOfWork to DatabaseManager methods via `uow=` so
+        their statements share the transaction; it commits when the block
+        exits cleanly and rolls back otherwise. Side effects on in-memory state
+        (such as the alert index) are applied only after the commit.
+        """
         async with self.async_session() as session:
-            alert = PriceAlert(
-                user_id=user.id,
-                collection_name=alert_data['collection_name'],
-                collection_address=alert_data['collection_address'],
-                chain=alert_data['chain'],
-                threshold_price=alert_data['threshold_price'],
-                direction=alert_data['direction'],
+            work = UnitOfWork(session)
+            async with session.begin():
+                yield work
+            work.committed()
+
+    @asynccontextmanager
+    async def _work(self, uow: "UnitOfWork | None"):
+        """Uses the caller's unit of work, or a short one of our own."""
+        if uow is not None:
+            yield uow
+        else:
+            async with self.unit_of_work() as work:
+                yield work
+
+    async def get_or_create_collection(
+        self, chain, address: str, name: str, metadata: dict = None, uow: "UnitOfWork" = None
+    ) -> int:
+        """
+        Records a collection (refreshing its cached name and metadata if it is
+        already known) and returns its id, with one upsert statement. Without
+        `metadata`, the cached metadata of a known collection is kept.
+        """
+        values = {
+            "chain": normalize_chain(chain),
+            "address": address.lower(),
+            "name": name,
+            "name_key": normalize_name(name),
+        }
+        if metadata is not None:
+            values["collection_metadata"] = metadata
+        insert_ = _DIALECT_INSERTS.get(self.engine.dialect.name)
+        async with self._work(uow) as work:
+            if insert_ is not None:
+                statement = insert_(Collection).values(**values)
+                refreshed = {
+                    "name": statement.excluded.name,
+                    "name_key": statement.excluded.name_key,
+                    "updated_at": func.now(),
+                }
+                if metadata is not None:
+                    refreshed["metadata"] = statement.excluded.metadata
+                return await work.session.scalar(
+                    statement.on_conflict_do_update(
+                        index_elements=[Collection.chain, Collection.address], set_=refreshed
+                    ).returning(Collection.id)
+                )
+            collection = await work.session.scalar(
+                select(Collection).filter_by(chain=values["chain"], address=values["address"])
             )
-            session.add(alert)
-            await session.commit()
-            await session.refresh(alert)
-            return alert
+            if collection is None:
+                collection = Collection(**values)
+                work.session.add(collection)
+            else:
+                collection.name, collection.name_key = values["name"], values["name_key"]
+                if metadata is not None:
+                    collection.collection_metadata = metadata
+            await work.session.flush()
+            return collection.id
 
-    async def create_new_listing_alert(self, user: User, alert_data: dict) -> NewListingAlert:
-        async with self.async_session() as session:
-            alert = NewListingAlert(
-                user_id=user.id,
-                collection_name=alert_data['collection_name'],
-                collection_address=alert_data['collection_address'],
-                chain=alert_data['chain'],
+    async def add_collection_alias(self, name: str, collection_id: int, uow: "UnitOfWork" = None):
+        """Remembers that `name`, as a user typed it, resolved to `collection_id`."""
+        alias_key = normalize_name(name)
+        if not alias_key:
+            return
+        insert_ = _DIALECT_INSERTS.get(self.engine.dialect.name)
+        async with self._work(uow) as work:
+            if insert_ is not None:
+                statement = insert_(CollectionAlias).values(alias_key=alias_key, collection_id=collection_id)
+                await work.session.execute(
+                    statement.on_conflict_do_update(
+                        index_elements=[CollectionAlias.alias_key],
+                        set_={"collection_id": statement.excluded.collection_id, "updated_at": func.now()},
+                    )
+                )
+            else:
+                await work.session.merge(CollectionAlias(alias_key=alias_key, collection_id=collection_id))
+
+    async def find_collection(self, name: str, uow: "UnitOfWork" = None) -> dict | None:
+        """
+        Looks up a collection we have already resolved by the name a user typed,
+        via the alias recorded when that name was first resolved (one primary
+        key lookup, so the answer does not depend on which row changed last).
+
+        Returns:
+            A dictionary shaped like `UnleashNFTsService.search_collection`'s
+            result, plus the "collection_id", or None if the name is unknown.
+        """
+        name_key = normalize_name(name)
+        if not name_key:
+            return None
+        async with self._work(uow) as work:
+            collection = await work.session.scalar(
+                select(Collection)
+                .join(CollectionAlias, CollectionAlias.collection_id == Collection.id)
+                .where(CollectionAlias.alias_key == name_key)
+            )
+        if collection is None:
+            return None
+        chain = int(collection.chain) if collection.chain.isdigit() else collection.chain
+        metadata = {
+            "name": collection.name,
+            "contract_address": collection.address,
+            "chain_id": chain,
+            **(collection.collection_metadata or {}),
+        }
+        return {"metadata": metadata, "collection_id": collection.id}
+
+    async def create_price_alert(self, user: User, alert_data: dict, uow: "UnitOfWork" = None) -> PriceAlert:
+        alerts = await self.create_price_alerts(user, [alert_data], uow=uow)
+        return alerts[0]
+
+    async def create_price_alerts(self, user: User, alerts_data: list[dict], uow: "UnitOfWork" = None) -> list[PriceAlert]:
+        """Inserts many price alerts with one INSERT ... RETURNING statement."""
+        if not alerts_data:
+            return []
+        rows = [
+            {
+                "user_id": user.id,
+                "collection_id": alert_data.get('collection_id'),
+                "collection_name": alert_data['collection_name'],
+                "collection_address": alert_data['collection_address'],
+                "chain": alert_data['chain'],
+                "threshold_price": alert_data['threshold_price'],
+                "direction": alert_data['direction'],
+            }
+            for alert_data in alerts_data
+        ]
+        async with self._work(uow) as work:
+            # Link every alert to its collection row, creating rows for collections we haven't seen.
+            collection_ids = {}
+            for row in rows:
+                if row["collection_id"] is None:
+                    key = (normalize_chain(row["chain"]), row["collection_address"].lower())
+                    if key not in collection_ids:
+                        collection_ids[key] = await self.get_or_create_collection(
+                            row["chain"], row["collection_address"], row["collection_name"], uow=work
+                        )
+                    row["collection_id"] = collection_ids[key]
+            result = await work.session.scalars(
+                insert(PriceAlert).returning(PriceAlert, sort_by_parameter_order=True), rows
             )
-            session.add(alert)
-            await session.commit()
-            await session.refresh(alert)
-            return alert
+            alerts = list(result)
+            work.after_commit(lambda: self._index_alerts(alerts))
+        return alerts
 
-    async def create_tracked_wallet(self, user: User, wallet_address: str) -> TrackedWallet:
+    def _index_alerts(self, alerts: list[PriceAlert]):
+        self._apply_index_change(self.alert_index, "add", alerts)
+        if self._index_changes is not None:
+            self._index_changes.append(("add", alerts))
+
+    def _unindex_alerts(self, alert_ids: list[int]):
+        self._apply_index_change(self.alert_index, "remove", alert_ids)
+        if self._index_changes is not None:
+            self._index_changes.append(("remove", alert_ids))
+
+    @staticmethod
+    def _apply_index_change(index: AlertIndex, kind: str, items: list):
+        if kind == "remove":
+            index.remove(items)
+            return
+        for alert in items:
+            index.add(
+                alert.id, alert.chain, alert.collection_address, alert.direction, alert.threshold_price,
+                alert.collection_id,
+            )
+
+    async def create_new_listing_alert(self, user: User, alert_data: dict, uow: "UnitOfWork" = None) -> NewListingAlert:
+        async with self._work(uow) as work:
+            return await work.session.scalar(
+                insert(NewListingAlert)
+                .values(
+                    user_id=user.id,
+                    collection_name=alert_data['collection_name'],
+                    collection_address=alert_data['collection_address'],
+                    chain=alert_data['chain'],
+                )
+                .returning(NewListingAlert)
+            )
+
+    async def create_tracked_wallet(self, user: User, wallet_address: str, uow: "UnitOfWork" = None) -> TrackedWallet:
+        wallets = await self.create_tracked_wallets(user, [wallet_address], uow=uow)
+        return wallets[0]
+
+    async def create_tracked_wallets(self, user: User, wallet_addresses: list[str], uow: "UnitOfWork" = None) -> list[TrackedWallet]:
+        """Inserts many tracked wallets with one INSERT ... RETURNING statement."""
+        if not wallet_addresses:
+            return []
+        rows = [{"user_id": user.id, "wallet_address": address} for address in wallet_addresses]
+        async with self._work(uow) as work:
+            result = await work.session.scalars(
+                insert(TrackedWallet).returning(TrackedWallet, sort_by_parameter_order=True), rows
+            )
+            return list(result)
+
+    async def deactivate_price_alerts(self, alert_ids: list[int], chunk_size: int = 500) -> int:
+        """
+        Marks the given price alerts inactive with set-based UPDATEs.
+
+        Ids are processed in chunks to keep the IN (...) list bounded, all
+        inside one short transaction. Returns the number of rows updated.
+        """
+        if not alert_ids:
+            return 0
+        updated = 0
         async with self.async_session() as session:
-            wallet = TrackedWallet(
-                user_id=user.id,
-                wallet_address=wallet_address,
+            async with session.begin():
+                for i in range(0, len(alert_ids), chunk_size):
+                    chunk = alert_ids[i:i + chunk_size]
+                    result = await session.execute(
+                        update(PriceAlert)
+                        .where(PriceAlert.id.in_(chunk))
+                        .values(is_active=False)
+                        .execution_options(synchronize_session=False)
+                    )
+                    updated += result.rowcount
+        self._unindex_alerts(alert_ids)
+        return updated
+
+    async def iter_active_price_alerts(self, chunk_size: int = None):
+        """
+        Streams active price alerts in fixed-size chunks using keyset pagination on id.
+
+        Only the columns needed for evaluation are selected, and each chunk uses
+        its own short session, so memory and connection time stay flat no matter
+        how large the table is.
+
+        Yields:
+            Lists of (id, chain, collection_address, direction, threshold_price,
+            collection_id) rows; chain and address come from the linked
+            collection when there is one.
+        """
+        chunk_size = chunk_size or config.ALERT_SCAN_CHUNK_SIZE
+        last_id = 0
+        while True:
+            async with self.async_session() as session:
+                result = await session.execute(self._active_price_alerts_query(last_id, chunk_size))
+                rows = result.all()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1][0]
+
+    @staticmethod
+    def _active_price_alerts_query(after_id: int, limit: int):
+        """One keyset page of active alerts; served by the ix_price_alerts_active_id partial index."""
+        return (
+            select(
+                PriceAlert.id,
+                func.coalesce(Collection.chain, PriceAlert.chain),
+                func.coalesce(Collection.address, PriceAlert.collection_address),
+                PriceAlert.direction,
+                PriceAlert.threshold_price,
+                PriceAlert.collection_id,
             )
-            session.add(wallet)
-            await session.commit()
-            await session.refresh(wallet)
-            return wallet
+            .outerjoin(Collection, PriceAlert.collection_id == Collection.id)
+            .where(PriceAlert.is_active == True, PriceAlert.id > after_id)
+            .order_by(PriceAlert.id)
+            .limit(limit)
+        )
+
+    async def rebuild_alert_index(self, chunk_size: int = None) -> AlertIndex:
+        """
+        Reloads the in-memory alert index from the active alerts in the database.
+
+        The scheduler calls this at the start of every run, so alerts created
+        or deactivated by other processes are picked up on the next run.
+
+        Streaming bounds the rows and connection time of the scan, but the
+        finished index holds every active alert (a few compact array slots
+        each). Alerts this process creates or deactivates while the scan runs
+        may be missed by it, so those changes are recorded and replayed onto
+        the new index before it is swapped in.
+        """
+        if self._index_changes is not None:
+            raise RuntimeError("An alert index rebuild is already running")
+        self._index_changes = changes = []
+        try:
+            index = AlertIndex()
+            async for rows in self.iter_active_price_alerts(chunk_size):
+                index.load(rows)
+            index.finalize()
+            # No await between the replay and the swap, so nothing can slip in.
+            for kind, items in changes:
+                self._apply_index_change(index, kind, items)
+            self.alert_index = index
+        finally:
+            self._index_changes = None
+        return index
+
+    async def iter_price_alert_recipients(self, alert_ids: list[int], chunk_size: int = None):
+        """
+        Streams what is needed to notify the owners of the given active alerts,
+        querying the ids in fixed-size chunks.
+
+        Yields:
+            Lists of (id, collection_name, direction, threshold_price, telegram_user_id) rows.
+        """
+        chunk_size = chunk_size or config.ALERT_SCAN_CHUNK_SIZE
+        for i in range(0, len(alert_ids), chunk_size):
+            async with self.async_session() as session:
+                result = await session.execute(
+                    select(
+                        PriceAlert.id,
+                        PriceAlert.collection_name,
+                        PriceAlert.direction,
+                        PriceAlert.threshold_price,
+                        User.telegram_user_id,
+                    )
+                    .join(User, PriceAlert.user_id == User.id)
+                    .where(PriceAlert.id.in_(alert_ids[i:i + chunk_size]), PriceAlert.is_active == True)
+                    .order_by(PriceAlert.id)
+                )
+                rows = result.all()
+            if rows:
+                yield rows
+
+    @asynccontextmanager
+    async def advisory_lock(self, key: int):
+        """
+        Tries to take a cross-process, session-level Postgres advisory lock.
+
+        Yields True if the lock was acquired (always True on other databases,
+        where there is only ever one process). The lock is held on a dedicated
+        connection, outside any transaction, until the block exits.
+        """
+        if self.engine.dialect.name != "postgresql":
+            yield True
+            return
+        async with self.engine.connect() as conn:
+            result = await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key})
+            acquired = bool(result.scalar())
+            await conn.commit()
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+                    await conn.commit()
 
 # Use a placeholder for the DB URL if it's not set (for testing)
 db_url = config.DATABASE_URL or "sqlite+aiosqlite:///:memory:"
@@ -0,0 +1,92 @@
+from sqlalchemy import func, insert, inspect, select, text, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.schema import CreateColumn
+
+from src.database.models import Base, Collection, PriceAlert, normalize_chain
+from src.services.collection_index import normalize_name
+
+
+def _add_missing_columns(sync_conn, inspector) -> list[str]:
+    """Adds nullable columns declared on the models to tables created before them."""
+    added = []
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{column.name} automatically")
+            ddl = str(CreateColumn(column).compile(dialect=sync_conn.dialect))
+            for foreign_key in column.foreign_keys:
+                ddl += f" REFERENCES {foreign_key.column.table.name} ({foreign_key.column.name})"
+            sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def _backfill_collections(sync_conn) -> int:
+    """Links price alerts that predate the collections table to a collection row."""
+    alerts, collections = PriceAlert.__table__, Collection.__table__
+    legacy = sync_conn.execute(
+        select(alerts.c.chain, alerts.c.collection_address, func.max(alerts.c.collection_name))
+        .where(alerts.c.collection_id.is_(None))
+        .group_by(alerts.c.chain, alerts.c.collection_address)
+    ).all()
+    for chain, address, name in legacy:
+        values = {"chain": normalize_chain(chain), "address": address.lower()}
+        collection_id = sync_conn.scalar(
+            select(collections.c.id).where(
+                collections.c.chain == values["chain"], collections.c.address == values["address"]
+            )
+        )
+        if collection_id is None:
+            collection_id = sync_conn.execute(
+                insert(collections).values(**values, name=name, name_key=normalize_name(name))
+            ).inserted_primary_key[0]
+        sync_conn.execute(
+            update(alerts)
+            .where(
+                alerts.c.collection_id.is_(None),
+                alerts.c.chain == chain,
+                alerts.c.collection_address == address,
+            )
+            .values(collection_id=collection_id)
+        )
+    return len(legacy)
+
+
+def _upgrade(sync_conn) -> list[str]:
+    Base.metadata.create_all(sync_conn)
+    inspector = inspect(sync_conn)
+    added = _add_missing_columns(sync_conn, inspector)
+    if added:
+        print(f"Added columns: {', '.join(added)}")
+        inspector = inspect(sync_conn)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(sync_conn)
+                created.append(index.name)
+    linked = _backfill_collections(sync_conn)
+    if linked:
+        print(f"Linked price alerts for {linked} collections to the collections table.")
+    return created
+
+
+async def migrate(engine: AsyncEngine) -> list[str]:
+    """
+    Brings the schema up to date with the models without dropping anything.
+
+    Missing tables are created, nullable columns added since a table was
+    created are added to it, and any index declared on the models that the
+    database does not have yet is created. Price alerts created before the
+    collections table existed are then linked to a collection row. Every
+    step is idempotent, so this is safe to run on every deploy.
+
+    Returns:
+        The names of the indexes created on tables that already existed.
+    """
+    async with engine.begin() as conn:
+        return await conn.run_sync(_upgrade)
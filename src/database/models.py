@@ -8,12 +8,23 @@ from sqlalchemy import (
     Boolean,
     DateTime,
     ForeignKey,
+    Index,
+    JSON,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 from sqlalchemy.sql import func
 
 Base = declarative_base()
 
+# Chain names stored by older alerts, mapped to the chain ids the UnleashNFTs API uses.
+_CHAIN_IDS = {"ethereum": "1", "eth": "1"}
+
+def normalize_chain(chain) -> str:
+    """Returns a chain id as a string, e.g. 1, "1" and "ethereum" all become "1"."""
+    chain = str(chain).strip().lower()
+    return _CHAIN_IDS.get(chain, chain)
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True)
@@ -25,6 +36,31 @@ class User(Base):
     new_listing_alerts = relationship("NewListingAlert", back_populates="user")
     tracked_wallets = relationship("TrackedWallet", back_populates="user")
 
+class Collection(Base):
+    """An NFT collection we have seen, keyed by (chain id, lowercased contract address)."""
+    __tablename__ = "collections"
+    id = Column(Integer, primary_key=True)
+    chain = Column(String, nullable=False)
+    address = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    name_key = Column(String, nullable=False)  # normalize_name(name), for lookups by what users type
+    collection_metadata = Column("metadata", JSON)  # cached 'metadata' block from the UnleashNFTs search
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    price_alerts = relationship("PriceAlert", back_populates="collection")
+
+    __table_args__ = (
+        UniqueConstraint("chain", "address", name="uq_collections_chain_address"),
+        Index("ix_collections_name_key", "name_key"),
+    )
+
+class CollectionAlias(Base):
+    """A name a user typed for a collection, so the same words resolve again without a search."""
+    __tablename__ = "collection_aliases"
+    alias_key = Column(String, primary_key=True)  # normalize_name(what the user typed)
+    collection_id = Column(Integer, ForeignKey("collections.id"), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class TrackedWallet(Base):
     __tablename__ = "tracked_wallets"
     id = Column(Integer, primary_key=True)
@@ -35,6 +71,15 @@ class TrackedWallet(Base):
 
     user = relationship("User", back_populates="tracked_wallets")
 
+    __table_args__ = (
+        Index("ix_tracked_wallets_user_id", "user_id"),
+        # Active wallets by address, for matching on-chain activity to watchers.
+        Index(
+            "ix_tracked_wallets_active_address", "wallet_address",
+            postgresql_where=is_active == True, sqlite_where=is_active == True,
+        ),
+    )
+
 class NewListingAlert(Base):
     __tablename__ = "new_listing_alerts"
     id = Column(Integer, primary_key=True)
@@ -47,10 +92,21 @@ class NewListingAlert(Base):
 
     user = relationship("User", back_populates="new_listing_alerts")
 
+    __table_args__ = (
+        Index("ix_new_listing_alerts_user_id", "user_id"),
+        Index(
+            "ix_new_listing_alerts_active_collection", "chain", "collection_address",
+            postgresql_where=is_active == True, sqlite_where=is_active == True,
+        ),
+    )
+
 class PriceAlert(Base):
     __tablename__ = "price_alerts"
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    collection_id = Column(Integer, ForeignKey("collections.id"))
+    # Legacy denormalized copies of the collection, kept for existing readers. They are
+    # still written for every alert, so this table does not shrink until they are dropped.
     collection_name = Column(String, nullable=False)
     collection_address = Column(String, nullable=False)
     chain = Column(String, nullable=False)
@@ -60,3 +116,22 @@ class PriceAlert(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="price_alerts")
+    collection = relationship("Collection", back_populates="price_alerts")
+
+    # Partial indexes cover only active rows, which is all the scheduler reads.
+    __table_args__ = (
+        Index("ix_price_alerts_user_id", "user_id"),
+        Index(
+            "ix_price_alerts_active_collection_id", "collection_id",
+            postgresql_where=is_active == True, sqlite_where=is_active == True,
+        ),
+        Index(
+            "ix_price_alerts_active_collection", "chain", "collection_address",
+            postgresql_where=is_active == True, sqlite_where=is_active == True,
+        ),
+        # Keyset scan of active alerts by id (iter_active_price_alerts).
+        Index(
+            "ix_price_alerts_active_id", "id",
+            postgresql_where=is_active == True, sqlite_where=is_active == True,
+        ),
+    )
@@ -0,0 +1,123 @@
+import time
+from collections import deque
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.config import config
+from src.metrics import (
+    DB_POOL_CHECKOUT_SECONDS,
+    DB_POOL_EXHAUSTED,
+    DB_POOL_TIMEOUTS,
+    DB_QUERY_SECONDS,
+    statement_label,
+)
+
+
+def _percentile(samples: deque, q: float) -> float | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _ms(seconds: float | None) -> float | None:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+class DatabaseTelemetry:
+    """
+    Pool and query timings for one engine.
+
+    Connection checkouts are timed by the pool class from `timed_pool_class`,
+    including how often a checkout had to wait because every connection was
+    in use and how often it gave up after the pool timeout. Statement timings
+    come from SQLAlchemy's cursor execute events; statements slower than
+    DB_SLOW_QUERY_MS are logged.
+    """
+
+    def __init__(self, window: int = 500):
+        self.checkout_waits = deque(maxlen=window)
+        self.query_times = deque(maxlen=window)
+        self.counts = {"checkouts": 0, "exhausted": 0, "timeouts": 0, "queries": 0, "slow_queries": 0}
+        self.engine = None
+
+    def record_checkout(self, seconds: float, exhausted: bool):
+        self.counts["checkouts"] += 1
+        self.counts["exhausted"] += exhausted
+        self.checkout_waits.append(seconds)
+        DB_POOL_CHECKOUT_SECONDS.observe(seconds)
+        if exhausted:
+            DB_POOL_EXHAUSTED.inc()
+
+    def record_query(self, seconds: float, statement: str):
+        self.counts["queries"] += 1
+        self.query_times.append(seconds)
+        DB_QUERY_SECONDS.labels(statement=statement_label(statement)).observe(seconds)
+        if seconds * 1000 >= config.DB_SLOW_QUERY_MS:
+            self.counts["slow_queries"] += 1
+            print(f"Slow query ({seconds * 1000:.0f} ms): {' '.join(statement.split())[:200]}")
+
+    def instrument(self, engine: Engine):
+        """Attaches query timing hooks to a (sync) engine."""
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        self.engine = engine
+
+    # The start time lives on the statement's execution context, so a statement
+    # that fails (and never reaches after_cursor_execute) leaves nothing behind.
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._mira_query_start = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_mira_query_start", None)
+        if started is not None:
+            self.record_query(time.perf_counter() - started, statement)
+
+    def stats(self) -> dict:
+        """Live pool state plus checkout-wait and query-time percentiles."""
+        pool = {}
+        # Read the pool now: engine.dispose() replaces it with a new one.
+        current = self.engine.pool if self.engine is not None else None
+        if current is not None and hasattr(current, "checkedout"):
+            pool = {
+                "size": current.size(),
+                "checked_in": current.checkedin(),
+                "checked_out": current.checkedout(),
+                "overflow": current.overflow(),
+            }
+        return {
+            **pool,
+            **self.counts,
+            "checkout_wait_p95_ms": _ms(_percentile(self.checkout_waits, 0.95)),
+            "checkout_wait_max_ms": _ms(max(self.checkout_waits, default=None)),
+            "query_p50_ms": _ms(_percentile(self.query_times, 0.5)),
+            "query_p95_ms": _ms(_percentile(self.query_times, 0.95)),
+        }
+
+
+def timed_pool_class(telemetry: DatabaseTelemetry) -> type:
+    """
+    An AsyncAdaptedQueuePool subclass that reports checkout waits to `telemetry`.
+
+    The telemetry is bound on the class so it survives `pool.recreate()`
+    (e.g. after `engine.dispose()`).
+    """
+
+    class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+        def _do_get(self):
+            exhausted = self.checkedin() == 0 and 0 <= self._max_overflow <= self.overflow()
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                telemetry.counts["timeouts"] += 1
+                DB_POOL_TIMEOUTS.inc()
+                telemetry.record_checkout(time.perf_counter() - started, exhausted)
+                raise
+            telemetry.record_checkout(time.perf_counter() - started, exhausted)
+            return connection
+
+    return TimedAsyncQueuePool
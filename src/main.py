@@ -4,7 +4,8 @@ import logging
 from aiohttp import web
 from src.bot import create_app
 from src.config import config
-from src.scheduler import check_price_alerts
+from src.metrics import render as render_metrics
+from src.scheduler import AlertRunCoordinator
 
 # Enable logging
 logging.basicConfig(
@@ -19,18 +20,35 @@ async def scheduler_webhook_handler(request: web.Request) -> web.Response:
         logger.warning("Unauthorized scheduler call attempt.")
         return web.Response(status=401, text="Unauthorized")
 
-    logger.info("Scheduler webhook called, checking alerts...")
     # We need the application object to send messages
     application = request.app["telegram_app"]
-    asyncio.create_task(check_price_alerts(application))
-    
-    return web.Response(text="Scheduler triggered.")
+    # At most one run is active; calls during a run coalesce into one follow-up run.
+    status = request.app["alert_runs"].trigger(application)
+    logger.info(f"Scheduler webhook called, alert run status: {status}")
+
+    return web.json_response(status)
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    """Serves Prometheus metrics for the bot, the scheduler and their dependencies."""
+    secret = request.match_info.get("secret")
+    if not config.METRICS_SECRET or secret != config.METRICS_SECRET:
+        logger.warning("Unauthorized metrics scrape attempt.")
+        return web.Response(status=401, text="Unauthorized")
+    payload, content_type = render_metrics()
+    return web.Response(body=payload, headers={"Content-Type": content_type})
+
+async def cancel_alert_runs(scheduler_app: web.Application) -> None:
+    """Cancels the in-flight alert run (and its outstanding fetches) on shutdown."""
+    await scheduler_app["alert_runs"].cancel()
 
 async def run_scheduler_server(application) -> web.AppRunner:
     """Sets up and runs the aiohttp server for the scheduler."""
     scheduler_app = web.Application()
     scheduler_app.router.add_get("/scheduler/{secret}", scheduler_webhook_handler)
+    scheduler_app.router.add_get("/metrics/{secret}", metrics_handler)
     scheduler_app["telegram_app"] = application  # Make the app available to the handler
+    scheduler_app["alert_runs"] = AlertRunCoordinator()
+    scheduler_app.on_shutdown.append(cancel_alert_runs)
 
     runner = web.AppRunner(scheduler_app)
     await runner.setup()
@@ -48,6 +66,10 @@ async def main() -> None:
 
     # --- Bot Setup ---
     await application.initialize()
+    # post_init/post_shutdown are only run automatically by run_polling/run_webhook,
+    # so invoke them ourselves around the manually managed lifecycle.
+    if application.post_init:
+        await application.post_init(application)
     port = int(os.environ.get("PORT", 8443))
     webhook_url = f"{config.WEBHOOK_URL}/{config.TELEGRAM_BOT_TOKEN}"
     await application.bot.set_webhook(url=webhook_url)
@@ -69,6 +91,11 @@ async def main() -> None:
             await asyncio.sleep(3600)
     finally:
         await scheduler_runner.cleanup()
+        await application.updater.stop()
+        await application.stop()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        await application.shutdown()
 
 
 if __name__ == "__main__":
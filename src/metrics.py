@@ -0,0 +1,66 @@
+import re
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Prometheus metrics for each stage of a chat turn and of a scheduler run,
+# served from the scheduler server's /metrics endpoint.
+
+# Chat turns take seconds (Gemini); DB queries and pool waits take milliseconds.
+_TURN_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+_FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+HANDLE_MESSAGE_SECONDS = Histogram(
+    "mira_handle_message_seconds", "Time to handle one chat message, by intent.", ["intent"],
+    buckets=_TURN_BUCKETS,
+)
+GEMINI_REQUEST_SECONDS = Histogram(
+    "mira_gemini_request_seconds", "Gemini call latency including queueing and retries.", ["model", "status"],
+    buckets=_TURN_BUCKETS,
+)
+GEMINI_QUEUE_DEPTH = Gauge(
+    "mira_gemini_queue_depth", "Gemini calls waiting for a concurrency slot.", ["model"],
+)
+UNLEASH_REQUEST_SECONDS = Histogram(
+    "mira_unleashnfts_request_seconds", "UnleashNFTs API latency, by endpoint and HTTP status.",
+    ["endpoint", "status"], buckets=_TURN_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "mira_db_query_seconds", "Database statement execution time, by statement type.", ["statement"],
+    buckets=_FAST_BUCKETS,
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "mira_db_pool_checkout_seconds", "Time to check a connection out of the pool.", buckets=_FAST_BUCKETS,
+)
+DB_POOL_EXHAUSTED = Counter(
+    "mira_db_pool_exhausted_total", "Checkouts that found every pooled connection in use.",
+)
+DB_POOL_TIMEOUTS = Counter(
+    "mira_db_pool_timeouts_total", "Checkouts that gave up after the pool timeout.",
+)
+SCHEDULER_RUN_SECONDS = Histogram(
+    "mira_scheduler_run_seconds", "Duration of one price-alert run.", buckets=_TURN_BUCKETS,
+)
+ALERTS_EVALUATED = Counter("mira_alerts_evaluated_total", "Active price alerts evaluated by scheduler runs.")
+ALERTS_TRIGGERED = Counter("mira_alerts_triggered_total", "Price alerts triggered and delivered.")
+NOTIFICATIONS = Counter(
+    "mira_notifications_total", "Notification send outcomes (sent, failed, retried, rate_limited).", ["outcome"],
+)
+
+_ADDRESS_SEGMENT = re.compile(r"/0x[0-9a-fA-F]+")
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_label(endpoint: str) -> str:
+    """Templates ids out of an API path so each endpoint is one label value."""
+    return _NUMERIC_SEGMENT.sub("/{id}", _ADDRESS_SEGMENT.sub("/{address}", endpoint))
+
+
+def statement_label(statement: str) -> str:
+    """The SQL verb of a statement (select, insert, ...)."""
+    verb = statement.lstrip().split(None, 1)[:1]
+    return verb[0].lower() if verb else "unknown"
+
+
+def render() -> tuple[bytes, str]:
+    """Returns the exposition-format payload and its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
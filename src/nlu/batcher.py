@@ -0,0 +1,80 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests for a short window and runs them as one batch.
+
+    A batch is flushed after `max_wait` seconds or as soon as `max_batch_size`
+    requests are waiting. `run_batch` receives the list of items and should
+    return a list of results in the same order; any item whose result is None,
+    or the whole batch if the call fails or returns the wrong number of
+    results, is retried individually with `run_single`.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[list], Awaitable[list | None]],
+        run_single: Callable[[Any], Awaitable[Any]],
+        max_batch_size: int = 16,
+        max_wait: float = 0.03,
+    ):
+        self.run_batch = run_batch
+        self.run_single = run_single
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats = {"batches": 0, "batched_items": 0, "fallbacks": 0}
+        self._pending: list[tuple[Any, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[Any, asyncio.Future]]):
+        items = [item for item, _ in batch]
+        results = None
+        if len(batch) > 1:
+            try:
+                results = await self.run_batch(items)
+            except Exception as e:
+                print(f"Batch of {len(batch)} failed, falling back to single requests: {e}")
+            if results is not None and len(results) != len(batch):
+                print(f"Batch returned {len(results)} results for {len(batch)} requests; falling back.")
+                results = None
+            if results is not None:
+                self.stats["batches"] += 1
+                self.stats["batched_items"] += len(batch)
+        if results is None:
+            results = [None] * len(batch)
+
+        async def resolve(item, future, result):
+            try:
+                if result is None:
+                    if len(batch) > 1:
+                        self.stats["fallbacks"] += 1
+                    result = await self.run_single(item)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+
+        await asyncio.gather(*(resolve(item, future, result) for (item, future), result in zip(batch, results)))
@@ -0,0 +1,106 @@
+import re
+
+# Deterministic patterns for the phrasings most of our traffic uses. Anything
+# that does not match cleanly abstains (returns None) and goes to Gemini.
+
+WALLET_ADDRESS = re.compile(r"0x[0-9a-fA-F]{40}")
+
+_GREETING = re.compile(
+    r"^(?:hi|hello|hey|heya|hiya|yo|gm|good\s+(?:morning|afternoon|evening)|howdy|sup)"
+    r"(?:\s+(?:there|mira|bot))?[\s!.,👋]*$",
+    re.IGNORECASE,
+)
+
+_TRACK_WALLET = re.compile(
+    r"^(?:please\s+)?(?:(?:track|monitor|watch|follow)\s+(?:the\s+)?(?:wallet\s+)?(?:address\s+)?)?"
+    r"(?P<address>0x[0-9a-fA-F]{40})[\s.!]*$",
+    re.IGNORECASE,
+)
+
+_PRICE_ALERT = re.compile(
+    r"^(?:please\s+)?(?:alert|notify|tell|ping|message)\s+me\s+(?:when|if|once)\s+(?:the\s+)?"
+    r"(?P<collection>.+?)"
+    r"(?:\s+floor(?:\s+price)?)?"
+    r"(?:\s+(?:goes|is|gets|rises|climbs|falls|drops|dips|moves|trades))?"
+    r"\s+(?P<direction>above|below|over|under)"
+    r"\s+(?P<price>\d+(?:\.\d+)?)\s*(?:eth|ether|Ξ)?[\s.!]*$",
+    re.IGNORECASE,
+)
+
+_SUMMARY = re.compile(
+    r"^(?:(?:please\s+)?(?:give|show|get)\s+me\s+)?(?:an?\s+)?(?:summary|overview)\s+(?:of|for|on)\s+(?:the\s+)?"
+    r"(?P<collection>.+?)(?:\s+(?:collection|nfts?|project))?[\s?.!]*$"
+    r"|^(?:please\s+)?summari[sz]e\s+(?:the\s+)?(?P<collection2>.+?)(?:\s+(?:collection|nfts?|project))?[\s?.!]*$",
+    re.IGNORECASE,
+)
+
+_MARKET_TRENDS = re.compile(
+    r"^(?:(?:what\s+are|show\s+me|give\s+me)\s+)?(?:the\s+)?(?:current\s+)?(?:nft\s+)?market\s+(?:trends?|overview)[\s?.!]*$"
+    r"|^how(?:'s|\s+is)\s+the\s+(?:nft\s+)?market(?:\s+(?:doing|today))?[\s?.!]*$"
+    r"|^(?:the\s+)?(?:nft\s+)?market[\s?.!]*$",
+    re.IGNORECASE,
+)
+
+# A captured collection containing these is ambiguous ("doodles goes above 5 and",
+# "market"), so the price-alert rule abstains and Gemini decides.
+_AMBIGUOUS_COLLECTION = re.compile(r"\b(?:above|below|over|under|market)\b|\d", re.IGNORECASE)
+
+_DIRECTIONS = {"above": "above", "over": "above", "below": "below", "under": "below"}
+
+
+def _result(intent: str, entities: dict, confidence: float, pattern: str) -> dict:
+    return {
+        "intent": intent,
+        "entities": entities,
+        "confidence": confidence,
+        "reasoning": f"Matched the local '{pattern}' pattern.",
+    }
+
+
+def classify_fast(user_input: str) -> dict | None:
+    """
+    Classifies common phrasings with local rules, without calling Gemini.
+
+    Returns:
+        A result dictionary shaped like the Gemini classifier's, or None when
+        no rule matches confidently.
+    """
+    text = " ".join((user_input or "").split())
+    if not text or len(text) > 200:
+        return None
+
+    if _GREETING.match(text):
+        return _result("greeting", {}, 0.99, "greeting")
+
+    match = _TRACK_WALLET.match(text)
+    if match:
+        return _result("track_wallet", {"wallet_address": match.group("address")}, 0.97, "wallet address")
+
+    match = _PRICE_ALERT.match(text)
+    if match:
+        collection_name = match.group("collection").strip(" '\"")
+        if collection_name.lower().endswith("'s"):
+            collection_name = collection_name[:-2]
+        if _AMBIGUOUS_COLLECTION.search(collection_name):
+            return None
+        if collection_name:
+            price = float(match.group("price"))
+            entities = {
+                "collection_name": collection_name,
+                "threshold_price": int(price) if price.is_integer() else price,
+                "direction": _DIRECTIONS[match.group("direction").lower()],
+            }
+            return _result("set_price_alert", entities, 0.95, "price alert")
+
+    if _MARKET_TRENDS.match(text):
+        return _result("get_market_trends", {}, 0.95, "market trends")
+
+    match = _SUMMARY.match(text)
+    if match:
+        collection_name = (match.group("collection") or match.group("collection2") or "").strip(" '\"")
+        if _MARKET_TRENDS.match(collection_name):
+            return _result("get_market_trends", {}, 0.95, "market trends")
+        if collection_name:
+            return _result("get_project_summary", {"collection_name": collection_name}, 0.93, "summary")
+
+    return None
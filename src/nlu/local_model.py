@@ -0,0 +1,250 @@
+"""
+A small distilled intent classifier trained from logged Gemini labels.
+
+Gemini classifications are appended to a JSONL label log. Offline, this module
+trains a TF-IDF + multinomial logistic regression model on those labels
+(pure Python, no extra dependencies), calibrates its confidence with
+temperature scaling and saves it as a JSON file that the bot loads at startup.
+
+Usage:
+    python -m src.nlu.local_model train --logs nlu_labels.jsonl --out nlu_local_model.json
+    python -m src.nlu.local_model evaluate --logs nlu_labels.jsonl --model nlu_local_model.json
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+from collections import Counter
+
+from src.config import config
+
+_TOKEN = re.compile(r"0x[0-9a-f]{40}|\d+(?:\.\d+)?|[a-z]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased word unigrams and bigrams, with addresses and numbers templated."""
+    words = []
+    for token in _TOKEN.findall(text.casefold()):
+        if token.startswith("0x"):
+            words.append("<addr>")
+        elif token[0].isdigit():
+            words.append("<num>")
+        else:
+            words.append(token)
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def is_holdout(text: str, fraction: float) -> bool:
+    """Deterministically assigns a message to the held-out split by hashing its text."""
+    digest = hashlib.sha1(" ".join(text.casefold().split()).encode()).digest()
+    return int.from_bytes(digest[:4], "big") / 2**32 < fraction
+
+
+def log_label(user_input: str, result: dict, path: str = None):
+    """Appends one Gemini classification to the label log (if a path is configured)."""
+    path = path or config.NLU_LABEL_LOG_PATH
+    if not path:
+        return
+    record = {
+        "ts": time.time(),
+        "text": user_input,
+        "intent": result.get("intent"),
+        "entities": result.get("entities", {}),
+        "confidence": result.get("confidence"),
+    }
+    try:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print(f"Could not write NLU label log: {e}")
+
+
+def load_labels(path: str, min_confidence: float = 0.7) -> list[tuple[str, str]]:
+    """Reads (text, intent) pairs from a label log, de-duplicated by text, latest label winning."""
+    labels = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            text, intent = record.get("text"), record.get("intent")
+            confidence = record.get("confidence") or 0.0
+            if not text or not intent or confidence < min_confidence:
+                continue
+            labels[" ".join(text.casefold().split())] = (text, intent)
+    return list(labels.values())
+
+
+def _softmax(scores: list[float]) -> list[float]:
+    top = max(scores)
+    exps = [math.exp(s - top) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+class LocalIntentModel:
+    """TF-IDF features with a multinomial logistic regression over intents."""
+
+    def __init__(self, classes: list[str], idf: dict[str, float], weights: dict[str, list[float]],
+                 bias: list[float], temperature: float = 1.0):
+        self.classes = classes
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+        self.temperature = temperature
+
+    def _features(self, text: str) -> dict[str, float]:
+        counts = Counter(t for t in tokenize(text) if t in self.idf)
+        vector = {t: c * self.idf[t] for t, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {t: v / norm for t, v in vector.items()}
+
+    def _scores(self, features: dict[str, float]) -> list[float]:
+        scores = list(self.bias)
+        for token, value in features.items():
+            for k, w in enumerate(self.weights[token]):
+                scores[k] += w * value
+        return scores
+
+    def predict(self, text: str) -> tuple[str, float]:
+        """Returns the most likely intent and its calibrated probability."""
+        scores = self._scores(self._features(text))
+        probs = _softmax([s / self.temperature for s in scores])
+        best = max(range(len(probs)), key=probs.__getitem__)
+        return self.classes[best], probs[best]
+
+    @classmethod
+    def train(cls, examples: list[tuple[str, str]], epochs: int = 40, learning_rate: float = 0.5,
+              l2: float = 1e-4, calibration_fraction: float = 0.15, seed: int = 0) -> "LocalIntentModel":
+        """Fits the model on (text, intent) pairs and calibrates it on a slice of them."""
+        rng = random.Random(seed)
+        examples = list(examples)
+        rng.shuffle(examples)
+        n_calibration = int(len(examples) * calibration_fraction) if len(examples) >= 20 else 0
+        calibration, training = examples[:n_calibration], examples[n_calibration:]
+
+        classes = sorted({intent for _, intent in examples})
+        class_index = {c: i for i, c in enumerate(classes)}
+        document_frequency = Counter()
+        for text, _ in training:
+            document_frequency.update(set(tokenize(text)))
+        n = len(training)
+        idf = {t: math.log((1 + n) / (1 + df)) + 1 for t, df in document_frequency.items()}
+        model = cls(classes, idf, {t: [0.0] * len(classes) for t in idf}, [0.0] * len(classes))
+
+        data = [(model._features(text), class_index[intent]) for text, intent in training]
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1 + epoch * 0.1)
+            for features, label in data:
+                probs = _softmax(model._scores(features))
+                probs[label] -= 1.0
+                for k, gradient in enumerate(probs):
+                    model.bias[k] -= rate * gradient
+                for token, value in features.items():
+                    row = model.weights[token]
+                    for k, gradient in enumerate(probs):
+                        row[k] -= rate * (gradient * value + l2 * row[k])
+
+        if calibration:
+            model.temperature = model._fit_temperature(
+                [(model._features(text), class_index.get(intent)) for text, intent in calibration]
+            )
+        return model
+
+    def _fit_temperature(self, data) -> float:
+        """Picks the temperature minimizing negative log-likelihood on calibration data."""
+        scored = [(self._scores(features), label) for features, label in data if label is not None]
+        if not scored:
+            return 1.0
+        best_t, best_nll = 1.0, float("inf")
+        for t in [0.25 * i for i in range(1, 21)]:
+            nll = -sum(math.log(max(_softmax([s / t for s in scores])[label], 1e-12)) for scores, label in scored)
+            if nll < best_nll:
+                best_t, best_nll = t, nll
+        return best_t
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "classes": self.classes,
+                "idf": self.idf,
+                "weights": self.weights,
+                "bias": self.bias,
+                "temperature": self.temperature,
+            }, f)
+
+    @classmethod
+    def load(cls, path: str) -> "LocalIntentModel":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["classes"], data["idf"], data["weights"], data["bias"], data.get("temperature", 1.0))
+
+
+def load_default_model() -> LocalIntentModel | None:
+    """Loads the model shipped at NLU_LOCAL_MODEL_PATH, if there is one."""
+    path = config.NLU_LOCAL_MODEL_PATH
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return LocalIntentModel.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not load local NLU model from {path}: {e}")
+        return None
+
+
+def evaluate(model: LocalIntentModel, examples: list[tuple[str, str]], min_confidence: float) -> dict:
+    """Reports agreement with Gemini's labels overall and for the messages routed locally."""
+    routed = agreed = routed_agreed = 0
+    for text, intent in examples:
+        predicted, confidence = model.predict(text)
+        agreed += predicted == intent
+        if confidence >= min_confidence:
+            routed += 1
+            routed_agreed += predicted == intent
+    total = len(examples)
+    return {
+        "examples": total,
+        "agreement": agreed / total if total else 0.0,
+        "coverage": routed / total if total else 0.0,
+        "routed_agreement": routed_agreed / routed if routed else 0.0,
+        "min_confidence": min_confidence,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train or evaluate the distilled local intent model.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name in ("train", "evaluate"):
+        sub = subparsers.add_parser(name)
+        sub.add_argument("--logs", default=config.NLU_LABEL_LOG_PATH, help="JSONL label log")
+        sub.add_argument("--holdout", type=float, default=0.2, help="Fraction of messages held out for evaluation")
+        sub.add_argument("--min-label-confidence", type=float, default=0.7)
+    subparsers.choices["train"].add_argument("--out", default=config.NLU_LOCAL_MODEL_PATH)
+    subparsers.choices["train"].add_argument("--epochs", type=int, default=40)
+    evaluate_parser = subparsers.choices["evaluate"]
+    evaluate_parser.add_argument("--model", default=config.NLU_LOCAL_MODEL_PATH)
+    evaluate_parser.add_argument("--min-confidence", type=float, default=config.NLU_LOCAL_MODEL_MIN_CONFIDENCE)
+    args = parser.parse_args(argv)
+
+    labels = load_labels(args.logs, args.min_label_confidence)
+    training = [(t, i) for t, i in labels if not is_holdout(t, args.holdout)]
+    held_out = [(t, i) for t, i in labels if is_holdout(t, args.holdout)]
+
+    if args.command == "train":
+        model = LocalIntentModel.train(training, epochs=args.epochs)
+        model.save(args.out)
+        print(f"Trained on {len(training)} messages ({len(held_out)} held out); "
+              f"temperature {model.temperature:.2f}; saved to {args.out}")
+    else:
+        report = evaluate(LocalIntentModel.load(args.model), held_out, args.min_confidence)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
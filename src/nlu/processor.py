@@ -1,10 +1,22 @@
 import google.generativeai as genai
+import asyncio
+import copy
 import json
+import re
 
+from src.cache import TTLCache
 from src.config import config
+from src.nlu.batcher import MicroBatcher
+from src.nlu.fast_path import WALLET_ADDRESS, classify_fast
+from src.nlu.local_model import load_default_model, log_label
+from src.services.gemini_ai import gemini_service
+from src.services.gemini_governor import gemini_governor
+from src.services.prompt_builder import estimate_tokens, log_prompt_tokens
 
 genai.configure(api_key=config.GEMINI_API_KEY)
 model = genai.GenerativeModel('gemini-2.5-pro')
+# Cheaper first tier; requests escalate to `model` only when needed.
+flash_model = gemini_service.alert_model
 
 # Define the intents and entities the model should recognize
 INTENT_SCHEMA = {
@@ -37,9 +49,186 @@ INTENT_SCHEMA = {
     "required": ["intent", "confidence", "reasoning"]
 }
 
+# Gemini's response_schema only accepts a subset of JSON Schema (no numeric bounds).
+_UNSUPPORTED_SCHEMA_KEYS = {"minimum", "maximum"}
+
+
+def _to_response_schema(schema):
+    if isinstance(schema, dict):
+        return {k: _to_response_schema(v) for k, v in schema.items() if k not in _UNSUPPORTED_SCHEMA_KEYS}
+    return schema
+
+
+JSON_GENERATION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=_to_response_schema(INTENT_SCHEMA),
+)
+
+BATCH_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"index": {"type": "integer"}, **INTENT_SCHEMA["properties"]},
+        "required": ["index", *INTENT_SCHEMA["required"]],
+    },
+}
+
+BATCH_GENERATION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=_to_response_schema(BATCH_SCHEMA),
+)
+
+_INTENTS = set(INTENT_SCHEMA["properties"]["intent"]["enum"])
+_DIRECTIONS = set(INTENT_SCHEMA["properties"]["entities"]["properties"]["direction"]["enum"])
+
+# Static prompt text is built once; only the user's message is spliced in per call.
+_SCHEMA_JSON = json.dumps(INTENT_SCHEMA, separators=(",", ":"))
+_INTENT_DEFINITIONS = """Intent definitions:
+- set_price_alert: User wants to be notified about a price change for an NFT collection.
+- set_new_listing_alert: User wants to know when new NFTs from a collection are listed.
+- get_project_summary: User is asking for a summary or details about an NFT project.
+- track_wallet: User wants to monitor an Ethereum wallet address for NFT activity.
+- get_market_trends: User is asking for a general overview of the NFT market.
+- greeting: A simple greeting or introductory message.
+- unknown: The user's intent cannot be determined from the request.
+"""
+_PROMPT_PREFIX = (
+    "Analyze the following user request and classify it into one of the predefined intents. "
+    "Extract any relevant entities based on the schema.\n"
+    f"Your response MUST be a valid JSON object that adheres to this schema: {_SCHEMA_JSON}\n"
+    f"{_INTENT_DEFINITIONS}"
+    "Provide a confidence score between 0 and 1 and a brief reasoning for your classification.\n\n"
+    'User Request: "'
+)
+_PROMPT_SUFFIX = '"\n\nJSON Response:'
+_BATCH_PROMPT_PREFIX = (
+    "Analyze each of the following numbered user requests independently and classify it into one of the "
+    "predefined intents. Extract any relevant entities based on the schema.\n"
+    "Your response MUST be a JSON array with exactly one object per request, each carrying the request's "
+    f"number in \"index\" and adhering to this schema: {_SCHEMA_JSON}\n"
+    f"{_INTENT_DEFINITIONS}"
+    "Provide a confidence score between 0 and 1 and a brief reasoning for each classification.\n\n"
+    "User Requests:\n"
+)
+_BATCH_PROMPT_SUFFIX = "\n\nJSON Response:"
+
+# Distilled local model, loaded once at startup if one has been trained.
+local_model = load_default_model()
+
+# Intents the local model can answer on its own, since they need no entities
+# it cannot extract. track_wallet is also handled when an address is present.
+_ENTITY_FREE_INTENTS = {"greeting", "get_market_trends"}
+
+# Cache of Gemini classifications keyed on normalized input. Numbers and
+# wallet addresses can be templated out of the key so "alert me if X drops
+# below 5" and "... below 6" share one entry; they are re-filled on a hit.
+nlu_cache = TTLCache(maxsize=config.NLU_CACHE_MAX_ENTRIES, ttl=config.NLU_CACHE_TTL_SECONDS)
+
+_NUMBER = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+_ADDRESS_SLOT = "<addr>"
+_NUMBER_SLOT = "<num>"
+
+
+def _normalize(user_input: str) -> str:
+    return " ".join(user_input.casefold().split())
+
+
+def _template(user_input: str) -> tuple[str, list[str], list[str]]:
+    """Returns the normalized templated text plus the addresses and numbers taken out of it."""
+    text = " ".join(user_input.split())
+    addresses = WALLET_ADDRESS.findall(text)
+    text = WALLET_ADDRESS.sub(_ADDRESS_SLOT, text)
+    numbers = _NUMBER.findall(text)
+    text = _NUMBER.sub(_NUMBER_SLOT, text)
+    return text.casefold(), addresses, numbers
+
+
+def _to_template(result: dict, addresses: list[str], numbers: list[str]) -> dict | None:
+    """
+    Rewrites a result so its entity values point at template slots.
+    Returns None if the result depends on the literal values in another way.
+    """
+    entities = dict(result.get("entities") or {})
+    wallet = entities.get("wallet_address")
+    if isinstance(wallet, str) and wallet.lower() in [a.lower() for a in addresses]:
+        entities["wallet_address"] = [a.lower() for a in addresses].index(wallet.lower())
+        wallet = None
+    price = entities.get("threshold_price")
+    if isinstance(price, (int, float)) and not isinstance(price, bool):
+        matches = [i for i, n in enumerate(numbers) if float(n) == float(price)]
+        if len(matches) != 1:
+            return None
+        entities["threshold_price"] = matches[0]
+    # Any other entity that repeats a templated value can't be safely shared.
+    literals = [a.lower() for a in addresses] + numbers
+    for name, value in entities.items():
+        if name in ("wallet_address", "threshold_price") and isinstance(value, int):
+            continue
+        if isinstance(value, str) and any(literal in value.lower() for literal in literals):
+            return None
+    templated = dict(result)
+    templated["entities"] = entities
+    return templated
+
+
+def _from_template(templated: dict, addresses: list[str], numbers: list[str]) -> dict | None:
+    result = copy.deepcopy(templated)
+    entities = result.get("entities") or {}
+    try:
+        if isinstance(entities.get("wallet_address"), int):
+            entities["wallet_address"] = addresses[entities["wallet_address"]]
+        if "threshold_price" in entities:
+            number = float(numbers[entities["threshold_price"]])
+            entities["threshold_price"] = int(number) if number.is_integer() else number
+    except (IndexError, TypeError):
+        return None
+    return result
+
+
+def _is_cacheable(result: dict) -> bool:
+    # Never cache the error fallback.
+    return not (result.get("intent") == "unknown" and result.get("confidence") == 0.0)
+
+
+def _cache_lookup(user_input: str) -> dict | None:
+    """Checks the templated key, then the exact key, counting one hit or miss per classification."""
+    result = None
+    if config.NLU_CACHE_TEMPLATE_ENTITIES:
+        templated_text, addresses, numbers = _template(user_input)
+        if addresses or numbers:
+            templated = nlu_cache.peek(("template", templated_text))
+            if templated is not None:
+                result = _from_template(templated, addresses, numbers)
+    if result is None:
+        cached = nlu_cache.peek(("exact", _normalize(user_input)))
+        result = copy.deepcopy(cached) if cached is not None else None
+    if result is None:
+        nlu_cache.misses += 1
+    else:
+        nlu_cache.hits += 1
+    return result
+
+
+def _cache_store(user_input: str, result: dict):
+    if not _is_cacheable(result):
+        return
+    if config.NLU_CACHE_TEMPLATE_ENTITIES:
+        templated_text, addresses, numbers = _template(user_input)
+        if addresses or numbers:
+            templated = _to_template(result, addresses, numbers)
+            if templated is not None:
+                nlu_cache.set(("template", templated_text), copy.deepcopy(templated))
+                return
+    nlu_cache.set(("exact", _normalize(user_input)), copy.deepcopy(result))
+
+
 async def classify_intent_and_extract_entities(user_input: str) -> dict:
     """
-    Uses Gemini 2.5 Pro to classify user intent and extract entities.
+    Classifies user intent and extracts entities.
+
+    Common phrasings are answered by the local fast path, repeated phrasings
+    by the NLU cache and entity-free intents by the distilled local model when
+    it is confident; Gemini is only called when all of those miss.
     
     Args:
         user_input: The raw text from the user.
@@ -48,41 +237,175 @@ async def classify_intent_and_extract_entities(user_input: str) -> dict:
         A dictionary containing the classified intent, extracted entities,
         confidence score, and the model's reasoning.
     """
-    prompt = f"""
-    Analyze the following user request and classify it into one of the predefined intents.
-    Extract any relevant entities based on the schema.
-    
-    Your response MUST be a valid JSON object that adheres to the following schema:
-    {json.dumps(INTENT_SCHEMA, indent=2)}
+    if config.NLU_FAST_PATH_ENABLED:
+        fast_result = classify_fast(user_input)
+        if fast_result and fast_result["confidence"] >= config.NLU_FAST_PATH_MIN_CONFIDENCE:
+            return fast_result
 
-    Here are the definitions for each intent:
-    - 'set_price_alert': User wants to be notified about a price change for an NFT collection.
-    - 'set_new_listing_alert': User wants to know when new NFTs from a collection are listed.
-    - 'get_project_summary': User is asking for a summary or details about an NFT project.
-    - 'track_wallet': User wants to monitor an Ethereum wallet address for NFT activity.
-    - 'get_market_trends': User is asking for a general overview of the NFT market.
-    - 'greeting': A simple greeting or introductory message.
-    - 'unknown': The user's intent cannot be determined from the request.
+    cached = _cache_lookup(user_input)
+    if cached is not None:
+        return cached
 
-    Provide a confidence score between 0 and 1.
-    Provide a brief reasoning for your classification.
+    local_result = _classify_local(user_input)
+    if local_result is not None:
+        return local_result
 
-    User Request: "{user_input}"
+    if config.NLU_BATCHING_ENABLED:
+        result = await nlu_batcher.submit(user_input)
+    else:
+        result = await _classify_with_gemini(user_input)
+    if _is_cacheable(result) and config.NLU_LABEL_LOG_PATH:
+        # File I/O would block the event loop for every other chat.
+        await asyncio.to_thread(log_label, user_input, result)
+    _cache_store(user_input, result)
+    return result
 
-    JSON Response:
-    """
-    
+
+def _classify_local(user_input: str) -> dict | None:
+    """Uses the distilled local model when it is confident and can supply the entities."""
+    if local_model is None:
+        return None
+    intent, confidence = local_model.predict(user_input)
+    if confidence < config.NLU_LOCAL_MODEL_MIN_CONFIDENCE:
+        return None
+    entities = {}
+    if intent == "track_wallet":
+        match = WALLET_ADDRESS.search(user_input)
+        if not match:
+            return None
+        entities["wallet_address"] = match.group(0)
+    elif intent not in _ENTITY_FREE_INTENTS:
+        return None
+    return {
+        "intent": intent,
+        "entities": entities,
+        "confidence": confidence,
+        "reasoning": "Classified by the local distilled model."
+    }
+
+
+def _validate(result) -> dict | None:
+    """Checks a parsed classification against INTENT_SCHEMA; returns it normalized, or None."""
+    if not isinstance(result, dict) or result.get("intent") not in _INTENTS:
+        return None
+    confidence = result.get("confidence")
+    if isinstance(confidence, bool) or not isinstance(confidence, (int, float)) or not 0 <= confidence <= 1:
+        return None
+    entities = result.get("entities") or {}
+    if not isinstance(entities, dict):
+        return None
+    if "direction" in entities and entities["direction"] not in _DIRECTIONS:
+        return None
+    price = entities.get("threshold_price")
+    if price is not None and (isinstance(price, bool) or not isinstance(price, (int, float))):
+        return None
+    result["entities"] = entities
+    result.setdefault("reasoning", "")
+    return result
+
+
+async def _classify_with_model(gemini_model, prompt: str, hedge_model=None) -> tuple[dict | None, Exception | None]:
+    """Runs one classification in JSON mode; returns (validated result, error)."""
     try:
-        response = await model.generate_content_async(prompt)
-        # The response from Gemini might be wrapped in markdown, so we clean it.
-        cleaned_json = response.text.strip().replace("```json", "").replace("```", "").strip()
-        result = json.loads(cleaned_json)
-        return result
+        response = await gemini_governor.generate_hedged(
+            gemini_model, hedge_model, prompt, generation_config=JSON_GENERATION_CONFIG
+        )
+        log_prompt_tokens("NLU", estimate_tokens(prompt), response)
+        result = _validate(json.loads(response.text))
+        if result is None:
+            return None, ValueError(f"Response failed validation: {response.text[:200]}")
+        return result, None
     except Exception as e:
-        print(f"Error during NLU processing: {e}")
-        return {
-            "intent": "unknown",
-            "entities": {},
-            "confidence": 0.0,
-            "reasoning": f"An error occurred during processing: {e}"
-        }
+        return None, e
+
+
+async def _classify_with_gemini(user_input: str) -> dict:
+    """
+    Classifies with Gemini, using tiered routing: the flash model answers first
+    and the request escalates to 2.5 Pro only when flash's confidence is below
+    NLU_ESCALATION_CONFIDENCE or its output fails validation.
+    """
+    prompt = _PROMPT_PREFIX + user_input + _PROMPT_SUFFIX
+
+    if not config.NLU_TIERED_ROUTING:
+        return await _classify_with_pro(prompt, hedge_model=flash_model)
+
+    result, error = await _classify_with_model(flash_model, prompt)
+    if result is not None and result["confidence"] >= config.NLU_ESCALATION_CONFIDENCE:
+        return result
+    print(f"Escalating NLU to gemini-2.5-pro (flash result: {result}, error: {error})")
+    return await _classify_with_pro(prompt, flash_result=result, flash_error=error)
+
+
+async def _classify_with_pro(
+    prompt: str, hedge_model=None, flash_result: dict = None, flash_error: Exception = None
+) -> dict:
+    """
+    The pro tier. `flash_result` is a low-confidence flash answer that has
+    already been obtained; it is returned if pro fails, since it still beats
+    the error fallback.
+    """
+    pro_result, pro_error = await _classify_with_model(model, prompt, hedge_model)
+    if pro_result is not None:
+        return pro_result
+    if flash_result is not None:
+        return flash_result
+
+    error = pro_error or flash_error
+    print(f"Error during NLU processing: {error}")
+    return {
+        "intent": "unknown",
+        "entities": {},
+        "confidence": 0.0,
+        "reasoning": f"An error occurred during processing: {error}"
+    }
+
+
+async def _classify_batch(user_inputs: list[str]) -> list[dict | None]:
+    """
+    Classifies several requests with one flash call returning an array.
+
+    Entries below NLU_ESCALATION_CONFIDENCE already have flash's answer, so
+    they go straight to the pro tier. Entries that are missing or invalid
+    come back as None so the batcher re-runs them through the normal tiered
+    path.
+    """
+    numbered = "\n".join(f"{i}. {json.dumps(text)}" for i, text in enumerate(user_inputs))
+    prompt = _BATCH_PROMPT_PREFIX + numbered + _BATCH_PROMPT_SUFFIX
+    response = await gemini_governor.generate(flash_model, prompt, generation_config=BATCH_GENERATION_CONFIG)
+    log_prompt_tokens("NLU batch", estimate_tokens(prompt), response)
+    items = json.loads(response.text)
+    if not isinstance(items, list):
+        raise ValueError("Batch response is not a JSON array")
+
+    results: list[dict | None] = [None] * len(user_inputs)
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        index = item.pop("index", None)
+        if not isinstance(index, int) or not 0 <= index < len(user_inputs) or results[index] is not None:
+            continue
+        results[index] = _validate(item)
+
+    low_confidence = [
+        i for i, result in enumerate(results)
+        if result is not None and result["confidence"] < config.NLU_ESCALATION_CONFIDENCE
+    ]
+    if low_confidence:
+        print(f"Escalating {len(low_confidence)} batched NLU results to gemini-2.5-pro")
+        escalated = await asyncio.gather(*(
+            _classify_with_pro(_PROMPT_PREFIX + user_inputs[i] + _PROMPT_SUFFIX, flash_result=results[i])
+            for i in low_confidence
+        ))
+        for i, result in zip(low_confidence, escalated):
+            results[i] = result
+    return results
+
+
+# Optional micro-batching of Gemini classifications for burst traffic.
+nlu_batcher = MicroBatcher(
+    _classify_batch,
+    _classify_with_gemini,
+    max_batch_size=config.NLU_BATCH_MAX_SIZE,
+    max_wait=config.NLU_BATCH_MAX_WAIT_MS / 1000,
+)
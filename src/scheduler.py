@@ -1,65 +1,216 @@
 import asyncio
-from sqlalchemy.future import select
+import time
 from telegram.ext import Application
 
+from src.config import config
 from src.database.manager import db_manager
-from src.database.models import PriceAlert, User
+from src.database.models import normalize_chain
+from src.metrics import ALERTS_EVALUATED, ALERTS_TRIGGERED, SCHEDULER_RUN_SECONDS
+from src.services.notifications import NotificationDispatcher
 from src.services.unleashnfts_api import unleash_nfts_service
 
-async def check_price_alerts(app: Application):
+def _chain_id(chain: str):
+    """Maps a stored chain (an id, or a legacy name like "ethereum") to the id the UnleashNFTs API expects."""
+    chain = normalize_chain(chain)
+    return int(chain) if chain.isdigit() else chain
+
+def _format_alert_message(collection_name: str, floor_price, direction: str, threshold_price) -> str:
+    return (
+        f"🚨 Price Alert for {collection_name}! 🚨\n\n"
+        f"The floor price is now {floor_price} ETH, which is {direction} "
+        f"your alert threshold of {threshold_price} ETH."
+    )
+
+async def _fetch_floor_snapshot(key, chain: str, address: str, semaphore: asyncio.Semaphore, timeout: float):
+    """Fetches metrics for one collection, bounded by the shared semaphore."""
+    async with semaphore:
+        try:
+            metrics = await asyncio.wait_for(
+                unleash_nfts_service.get_collection_metrics(
+                    blockchain=_chain_id(chain), address=address
+                ),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            print(f"Timed out fetching metrics for {address}")
+            metrics = None
+        except Exception as e:
+            print(f"Error fetching metrics for {address}: {e}")
+            metrics = None
+    return key, address, metrics
+
+async def check_price_alerts(app: Application) -> dict:
     """
     Fetches all active price alerts, checks if their conditions are met,
     and sends a notification using the provided bot instance.
+
+    Active alerts come from the in-memory alert index, rebuilt from the
+    database at the start of every run, which groups them by collection so
+    each distinct collection's metrics are fetched once. Fetches run
+    concurrently (bounded by ALERT_FETCH_CONCURRENCY) and each collection is
+    evaluated as soon as its metrics arrive, using a binary search over its
+    sorted thresholds. Cancelling the run cancels any outstanding fetches.
+
+    Returns:
+        Run statistics: alert and distinct collection counts, the fan-out
+        ratio (alerts per metrics request), the number of alerts evaluated
+        (those whose collection returned a floor price), the number of
+        triggered alerts delivered and the notification dispatcher's send
+        outcomes.
     """
     print("Checking price alerts...")
-    async with db_manager.async_session() as session:
-        # Join User table to get telegram_user_id
-        stmt = (
-            select(PriceAlert, User.telegram_user_id)
-            .join(User, PriceAlert.user_id == User.id)
-            .where(PriceAlert.is_active == True)
+    started = time.perf_counter()
+    stats = {"alerts": 0, "collections": 0, "fan_out": 0.0, "evaluated": 0, "triggered": 0}
+
+    # Phase 1: reload the active alerts, grouped by the collection they watch. Other
+    # processes (a second web instance, scripts) create and deactivate alerts too,
+    # so the database, not this process's index, decides what is active.
+    alert_index = await db_manager.rebuild_alert_index()
+    collections = alert_index.collections()
+    stats["alerts"] = len(alert_index)
+    stats["collections"] = len(collections)
+    if stats["collections"]:
+        stats["fan_out"] = stats["alerts"] / stats["collections"]
+    print(
+        f"Evaluating {stats['alerts']} alerts across {stats['collections']} collections "
+        f"(fan-out {stats['fan_out']:.1f}x)."
+    )
+
+    # Phase 2: fetch each collection once and evaluate all of its alerts.
+    # Notifications go through a rate-limited dispatcher; an alert is only
+    # deactivated once its message has actually been delivered.
+    delivered_ids = []
+    semaphore = asyncio.Semaphore(config.ALERT_FETCH_CONCURRENCY)
+    fetches = [
+        asyncio.create_task(
+            _fetch_floor_snapshot(key, chain, address, semaphore, config.ALERT_FETCH_TIMEOUT_SECONDS)
         )
-        result = await session.execute(stmt)
-        alerts_with_users = result.all()
+        for key, chain, address in collections
+    ]
+    try:
+        async with NotificationDispatcher(app.bot) as dispatcher:
+            for next_fetch in asyncio.as_completed(fetches):
+                key, address, metrics = await next_fetch
 
-        for alert, telegram_user_id in alerts_with_users:
-            print(f"Checking alert {alert.id} for {alert.collection_name}...")
-            
-            # Assuming chain is stored as an integer, matching the API
-            chain_id = 1 if alert.chain == "ethereum" else alert.chain
+                if not metrics or 'floor_price' not in metrics:
+                    print(f"Could not retrieve metrics for {address}")
+                    continue
 
-            metrics = await unleash_nfts_service.get_collection_metrics(
-                blockchain=chain_id, address=alert.collection_address
-            )
+                floor_price = metrics['floor_price']
+                # Only alerts whose collection actually got a floor price count as evaluated.
+                evaluated = alert_index.alert_count(key)
+                stats["evaluated"] += evaluated
+                ALERTS_EVALUATED.inc(evaluated)
+                alert_ids = alert_index.triggered(key, floor_price)
+                if not alert_ids:
+                    continue
+
+                # Only the triggered alerts are loaded, in short chunked sessions.
+                async for recipients in db_manager.iter_price_alert_recipients(alert_ids):
+                    for alert_id, collection_name, direction, threshold_price, telegram_user_id in recipients:
+                        print(f"ALERT TRIGGERED for {collection_name}!")
+                        message = _format_alert_message(collection_name, floor_price, direction, threshold_price)
+                        dispatcher.send(
+                            telegram_user_id,
+                            message,
+                            on_delivered=lambda alert_id=alert_id: delivered_ids.append(alert_id),
+                        )
+
+                # Persist deliveries as we go so a restart mid-drain doesn't re-notify.
+                if len(delivered_ids) >= config.ALERT_SCAN_CHUNK_SIZE:
+                    stats["triggered"] += len(delivered_ids)
+                    ALERTS_TRIGGERED.inc(len(delivered_ids))
+                    flushed, delivered_ids[:] = delivered_ids[:], []
+                    await db_manager.deactivate_price_alerts(flushed)
+        stats["notifications"] = dispatcher.stats
+    finally:
+        for fetch in fetches:
+            fetch.cancel()
+        # Deactivate everything that was delivered in one short, set-based transaction,
+        # even if the run was cancelled part-way through.
+        stats["triggered"] += len(delivered_ids)
+        ALERTS_TRIGGERED.inc(len(delivered_ids))
+        # Observed before the last await so failed and cancelled runs are recorded too.
+        SCHEDULER_RUN_SECONDS.observe(time.perf_counter() - started)
+        await db_manager.deactivate_price_alerts(delivered_ids)
+    print(f"Finished checking price alerts: {stats}")
+    return stats
+
+# Arbitrary, stable key for the Postgres advisory lock guarding alert runs.
+ALERT_RUN_LOCK_KEY = 0x6D697261
+
+class AlertRunCoordinator:
+    """
+    Ensures at most one price-alert run is active at a time.
+
+    Triggers that arrive while a run is in progress are coalesced into a single
+    follow-up run. On Postgres, a DB advisory lock extends the guarantee across
+    processes; a run that cannot take the lock is skipped.
+    """
+
+    def __init__(self, run=None, lock_key: int = ALERT_RUN_LOCK_KEY):
+        self._run = run or check_price_alerts
+        self._lock_key = lock_key
+        self._task: asyncio.Task | None = None
+        self._queued = False
+        self._started_at: float | None = None
+        self.last_duration: float | None = None
+        self.last_stats: dict | None = None
+        self.runs = 0
+        self.skipped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def trigger(self, app: Application) -> dict:
+        """Starts a run, or queues one follow-up run if a run is already active."""
+        if self.running:
+            self._queued = True
+        else:
+            self._task = asyncio.create_task(self._run_until_drained(app))
+        return self.status()
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self._queued,
+            "current_duration": (
+                time.monotonic() - self._started_at if self.running and self._started_at else None
+            ),
+            "last_duration": self.last_duration,
+            "last_stats": self.last_stats,
+            "runs": self.runs,
+            "skipped": self.skipped,
+        }
+
+    async def _run_until_drained(self, app: Application):
+        while True:
+            self._queued = False
+            self._started_at = time.monotonic()
+            try:
+                async with db_manager.advisory_lock(self._lock_key) as acquired:
+                    if acquired:
+                        self.last_stats = await self._run(app)
+                        self.runs += 1
+                    else:
+                        print("Another process is already checking price alerts; skipping this run.")
+                        self.skipped += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Price alert run failed: {e}")
+            finally:
+                self.last_duration = time.monotonic() - self._started_at
+            if not self._queued:
+                return
 
-            if not metrics or 'floor_price' not in metrics:
-                print(f"Could not retrieve metrics for {alert.collection_name}")
-                continue
-
-            floor_price = metrics['floor_price']
-
-            triggered = False
-            if alert.direction == 'below' and floor_price < alert.threshold_price:
-                triggered = True
-            elif alert.direction == 'above' and floor_price > alert.threshold_price:
-                triggered = True
-
-            if triggered:
-                print(f"ALERT TRIGGERED for {alert.collection_name}!")
-                message = (
-                    f"🚨 Price Alert for {alert.collection_name}! 🚨\n\n"
-                    f"The floor price is now {floor_price} ETH, which is {alert.direction} "
-                    f"your alert threshold of {alert.threshold_price} ETH."
-                )
-                try:
-                    await app.bot.send_message(chat_id=telegram_user_id, text=message)
-                    alert.is_active = False
-                    session.add(alert)
-                except Exception as e:
-                    print(f"Failed to send message to {telegram_user_id}: {e}")
-
-        await session.commit()
-    print("Finished checking price alerts.")
+    async def cancel(self):
+        """Cancels the active run (and any queued follow-up), e.g. on shutdown."""
+        self._queued = False
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
 
 async def main():
     # This is for standalone testing and won't be used by the bot itself
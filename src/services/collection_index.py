@@ -0,0 +1,112 @@
+import re
+import time
+from bisect import bisect_left
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_name(name: str) -> str:
+    """Casefolds a collection name and collapses punctuation and whitespace."""
+    return _NON_ALNUM.sub(" ", (name or "").casefold()).strip()
+
+
+def _trigrams(text: str) -> set:
+    """Returns the set of character trigrams of a normalized string."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CollectionIndex:
+    """
+    In-memory index of collection names for fast lookups.
+
+    Collections are stored in the order the API returned them (volume, descending),
+    so that position doubles as a popularity rank when breaking ties.
+    """
+
+    def __init__(self, min_similarity: float = 0.5):
+        self.min_similarity = min_similarity
+        self.refreshed_at: float | None = None
+        self._collections: list[dict] = []
+        self._names: list[str] = []
+        self._exact: dict[str, int] = {}
+        self._sorted_names: list[tuple[str, int]] = []
+        self._trigrams: dict[str, list[int]] = {}
+        self._gram_counts: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._collections)
+
+    def build(self, collections: list[dict]):
+        """Replaces the index contents with the given collections."""
+        names, exact, trigrams, gram_counts = [], {}, {}, []
+        for rank, collection in enumerate(collections):
+            name = normalize_name(collection.get("metadata", {}).get("name", ""))
+            names.append(name)
+            grams = _trigrams(name) if name else set()
+            # Only the size of each name's trigram set is needed for scoring.
+            gram_counts.append(len(grams))
+            if not name:
+                continue
+            # Keep the highest-volume collection for duplicate names.
+            exact.setdefault(name, rank)
+            for gram in grams:
+                trigrams.setdefault(gram, []).append(rank)
+
+        # Swap everything in at once so lookups never see a half-built index.
+        self._collections = list(collections)
+        self._names = names
+        self._exact = exact
+        self._sorted_names = sorted((name, rank) for rank, name in enumerate(names) if name)
+        self._trigrams = trigrams
+        self._gram_counts = gram_counts
+        self.refreshed_at = time.monotonic()
+
+    def lookup(self, name: str) -> dict | None:
+        """
+        Finds the best matching collection for a name.
+
+        Matches are tried as exact, then prefix, then substring, then trigram
+        similarity. Within a tier the highest-volume collection wins.
+        """
+        query = normalize_name(name)
+        if not query or not self._collections:
+            return None
+
+        rank = self._exact.get(query)
+        if rank is not None:
+            return self._collections[rank]
+
+        rank = self._best_prefix_match(query)
+        if rank is not None:
+            return self._collections[rank]
+
+        query_grams = _trigrams(query)
+        overlap: dict[int, int] = {}
+        for gram in query_grams:
+            for candidate in self._trigrams.get(gram, ()):
+                overlap[candidate] = overlap.get(candidate, 0) + 1
+
+        substring_ranks = [r for r in overlap if query in self._names[r]]
+        if substring_ranks:
+            return self._collections[min(substring_ranks)]
+
+        best_rank, best_score = None, 0.0
+        for candidate, shared in overlap.items():
+            # Dice coefficient over trigram sets.
+            score = 2 * shared / (len(query_grams) + self._gram_counts[candidate])
+            if score > best_score or (score == best_score and best_rank is not None and candidate < best_rank):
+                best_rank, best_score = candidate, score
+        if best_rank is not None and best_score >= self.min_similarity:
+            return self._collections[best_rank]
+        return None
+
+    def _best_prefix_match(self, query: str) -> int | None:
+        start = bisect_left(self._sorted_names, (query, -1))
+        best = None
+        for name, rank in self._sorted_names[start:]:
+            if not name.startswith(query):
+                break
+            if best is None or rank < best:
+                best = rank
+        return best
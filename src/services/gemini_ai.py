@@ -1,43 +1,154 @@
+import asyncio
 import google.generativeai as genai
+import hashlib
 import json
+from collections import Counter
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable
 
+from src.cache import TTLCache
 from src.config import config
+from src.services.gemini_governor import gemini_governor
+from src.services.prompt_builder import build_summary_prompt, log_prompt_tokens
 
 genai.configure(api_key=config.GEMINI_API_KEY)
 
+SUMMARY_ERROR_MESSAGE = "I'm sorry, I was unable to generate a summary at this time."
+
+
+def metrics_fingerprint(collection_data: dict) -> str:
+    """A stable hash of a metrics payload, independent of key order."""
+    payload = json.dumps(collection_data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
 class GeminiService:
     def __init__(self):
         self.summary_model = genai.GenerativeModel('gemini-2.5-pro')
         self.alert_model = genai.GenerativeModel('gemini-2.5-flash')
+        self.summary_cache = TTLCache(
+            maxsize=config.SUMMARY_CACHE_MAX_ENTRIES, ttl=config.SUMMARY_CACHE_TTL_SECONDS
+        )
+        self.summary_requests = Counter()
+        self._prewarm_task: asyncio.Task | None = None
 
-    async def generate_summary(self, collection_data: dict) -> str:
+    async def generate_summary(self, collection_data: dict, chain=None, address: str = None) -> str:
         """
         Generates a concise summary of an NFT collection using Gemini 2.5 Pro.
+
+        Summaries are cached by (chain, address, metrics fingerprint), so the
+        same collection with unchanged data is answered without calling Gemini.
         
         Args:
             collection_data: A dictionary of data fetched from the UnleashNFTs API.
+            chain: The collection's chain id, used for caching and popularity tracking.
+            address: The collection's contract address, used likewise.
             
         Returns:
             A string containing the AI-generated summary.
         """
-        prompt = f"""
-        Based on the following data for an NFT collection, generate a concise and insightful summary for a potential investor or collector.
-        
-        Highlight key metrics like floor price, volume, and number of holders. Mention any notable trends.
-        Keep the summary to 2-3 paragraphs.
+        collection_key = (str(chain), address.lower()) if address else None
+        if collection_key:
+            self._record_request(collection_key)
+        key = (*(collection_key or (None, None)), metrics_fingerprint(collection_data))
+        summary = await self.summary_cache.get_or_load(key, lambda: self._generate_summary(collection_data))
+        return summary or SUMMARY_ERROR_MESSAGE
 
-        Data:
-        {json.dumps(collection_data, indent=2)}
+    async def stream_summary(self, collection_data: dict, chain=None, address: str = None) -> AsyncIterator[str]:
+        """
+        Streams a summary as Gemini generates it, yielding text chunks.
 
-        Summary:
+        A cached summary is yielded in one piece; a freshly streamed one is
+        cached once complete. If generation fails before any text arrives, the
+        usual error message is yielded instead.
         """
-        
+        collection_key = (str(chain), address.lower()) if address else None
+        if collection_key:
+            self._record_request(collection_key)
+        key = (*(collection_key or (None, None)), metrics_fingerprint(collection_data))
+        cached = self.summary_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
         try:
-            response = await self.summary_model.generate_content_async(prompt)
+            prompt, estimated_tokens = build_summary_prompt(collection_data)
+            response = await gemini_governor.generate(self.summary_model, prompt, stream=True)
+            # Closing the stream frees its concurrency slot even if we stop early.
+            async with aclosing(response):
+                async for chunk in response:
+                    if chunk.text:
+                        chunks.append(chunk.text)
+                        yield chunk.text
+            log_prompt_tokens("Summary", estimated_tokens, response)
+        except Exception as e:
+            print(f"Error during streamed summary generation: {e}")
+            if not chunks:
+                yield SUMMARY_ERROR_MESSAGE
+            return
+        if chunks:
+            self.summary_cache.set(key, "".join(chunks))
+
+    async def _generate_summary(self, collection_data: dict) -> str | None:
+        try:
+            prompt, estimated_tokens = build_summary_prompt(collection_data)
+            response = await gemini_governor.generate_hedged(self.summary_model, self.alert_model, prompt)
+            log_prompt_tokens("Summary", estimated_tokens, response)
             return response.text
         except Exception as e:
             print(f"Error during summary generation: {e}")
-            return "I'm sorry, I was unable to generate a summary at this time."
+            return None
+
+    def _record_request(self, collection_key: tuple):
+        self.summary_requests[collection_key] += 1
+        limit = config.SUMMARY_POPULARITY_MAX_ENTRIES
+        if len(self.summary_requests) > limit:
+            # Drop the least requested quarter at once rather than one entry per request.
+            self.summary_requests = Counter(dict(self.summary_requests.most_common(limit * 3 // 4)))
+
+    def decay_popularity(self, factor: float = None):
+        """Shrinks every request count so recent demand outweighs old history."""
+        factor = config.SUMMARY_POPULARITY_DECAY if factor is None else factor
+        for key, count in list(self.summary_requests.items()):
+            if count * factor < 0.1:
+                del self.summary_requests[key]
+            else:
+                self.summary_requests[key] = count * factor
+
+    async def prewarm_popular_summaries(
+        self, fetch_metrics: Callable[..., Awaitable[dict | None]], top_n: int = None
+    ):
+        """Generates summaries ahead of time for the most requested collections."""
+        top_n = top_n or config.SUMMARY_PREWARM_TOP_N
+        for (chain, address), _ in self.summary_requests.most_common(top_n):
+            collection_data = await fetch_metrics(chain, address)
+            if not collection_data:
+                continue
+            key = (chain, address, metrics_fingerprint(collection_data))
+            if self.summary_cache.get(key) is None:
+                await self.summary_cache.get_or_load(key, lambda: self._generate_summary(collection_data))
+
+    async def _prewarm_loop(self, fetch_metrics, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.prewarm_popular_summaries(fetch_metrics)
+            except Exception as e:
+                print(f"Summary pre-generation failed: {e}")
+            self.decay_popularity()
+
+    def start_prewarm(self, fetch_metrics: Callable[..., Awaitable[dict | None]], interval: float = None):
+        """Starts pre-generating popular summaries in the background."""
+        if self._prewarm_task is None or self._prewarm_task.done():
+            interval = interval or config.SUMMARY_PREWARM_INTERVAL_SECONDS
+            self._prewarm_task = asyncio.create_task(self._prewarm_loop(fetch_metrics, interval))
+
+    async def stop_prewarm(self):
+        if self._prewarm_task is not None:
+            self._prewarm_task.cancel()
+            await asyncio.gather(self._prewarm_task, return_exceptions=True)
+            self._prewarm_task = None
 
 # Instantiate the service
 gemini_service = GeminiService()
@@ -0,0 +1,245 @@
+import asyncio
+import random
+import time
+from collections import deque
+
+from google.api_core import exceptions as google_exceptions
+
+from src.config import config
+from src.metrics import GEMINI_QUEUE_DEPTH, GEMINI_REQUEST_SECONDS
+
+# Quota (429) and server-side (5xx) errors are worth retrying; anything else is not.
+RETRYABLE_ERRORS = (google_exceptions.TooManyRequests, google_exceptions.ServerError)
+
+
+def model_name(model) -> str:
+    name = getattr(model, "model_name", None)
+    if not isinstance(name, str):
+        return type(model).__name__
+    return name.removeprefix("models/")
+
+
+class _ModelLane:
+    """Concurrency limit and latency bookkeeping for one Gemini model."""
+
+    def __init__(self, concurrency: int, window: int = 200):
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.waiting = 0
+        self.in_flight = 0
+        self.latencies = deque(maxlen=window)
+        self.counts = {"calls": 0, "errors": 0, "timeouts": 0, "retries": 0}
+
+    def percentile(self, q: float) -> float | None:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _HeldStream:
+    """
+    A streamed response that keeps its model's concurrency slot until the
+    stream is exhausted, fails or is closed. Other attributes (e.g.
+    usage_metadata) are read from the underlying response.
+    """
+
+    def __init__(self, response, release):
+        self._response = response
+        self._release = release
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._response, name)
+
+    async def __aiter__(self):
+        status = "cancelled"
+        try:
+            async for chunk in self._response:
+                yield chunk
+            status = "ok"
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            self.close(status)
+
+    def close(self, status: str = "cancelled"):
+        release, self._release = self._release, None
+        if release is not None:
+            release(status)
+
+    async def aclose(self):
+        self.close()
+
+    def __del__(self):
+        # Never leak the slot if a caller abandons the stream without closing it.
+        self.close()
+
+
+class GeminiGovernor:
+    """
+    Shared gate for every Gemini call.
+
+    Each model gets its own semaphore so a burst of slow pro requests cannot
+    starve flash. Every call has a deadline covering queueing and retries, and
+    429/5xx errors are retried with jittered exponential backoff while time
+    remains. `generate_hedged` additionally fires a backup request on a second
+    model once the primary is slower than its budget, and returns whichever
+    answers first.
+    """
+
+    def __init__(
+        self,
+        timeout: float = None,
+        max_retries: int = None,
+        retry_backoff: float = None,
+        hedge_after: float = None,
+        min_hedge_samples: int = 20,
+    ):
+        self.timeout = timeout or config.GEMINI_TIMEOUT_SECONDS
+        self.max_retries = config.GEMINI_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = config.GEMINI_RETRY_BACKOFF_SECONDS if retry_backoff is None else retry_backoff
+        self.hedge_after = config.GEMINI_HEDGE_AFTER_SECONDS if hedge_after is None else hedge_after
+        self.min_hedge_samples = min_hedge_samples
+        self.hedge_stats = {"hedged": 0, "hedge_wins": 0}
+        self._lanes: dict[str, _ModelLane] = {}
+
+    def _lane(self, name: str) -> _ModelLane:
+        lane = self._lanes.get(name)
+        if lane is None:
+            concurrency = config.GEMINI_PRO_CONCURRENCY if "pro" in name else config.GEMINI_FLASH_CONCURRENCY
+            lane = self._lanes[name] = _ModelLane(concurrency)
+        return lane
+
+    async def generate(self, model, prompt, timeout: float = None, **kwargs):
+        """
+        Calls `model.generate_content_async(prompt, **kwargs)` under the model's
+        concurrency limit. Raises asyncio.TimeoutError once the deadline passes.
+
+        For streamed calls (`stream=True`) the deadline covers the wait for
+        the first chunk. The returned stream holds the model's slot until it
+        is exhausted or closed, and its latency is kept out of the hedge
+        budget, which is based on whole non-streamed responses.
+        """
+        name = model_name(model)
+        lane = self._lane(name)
+        deadline = time.monotonic() + (timeout or self.timeout)
+        started = time.monotonic()
+        queue_depth = GEMINI_QUEUE_DEPTH.labels(model=name)
+        lane.waiting += 1
+        queue_depth.inc()
+        try:
+            await asyncio.wait_for(lane.semaphore.acquire(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            lane.counts["timeouts"] += 1
+            GEMINI_REQUEST_SECONDS.labels(model=name, status="timeout").observe(time.monotonic() - started)
+            raise
+        finally:
+            lane.waiting -= 1
+            queue_depth.dec()
+
+        lane.in_flight += 1
+        lane.counts["calls"] += 1
+        status = "error"
+        release = lambda status: self._release(lane, name, started, status)
+        try:
+            for attempt in range(self.max_retries + 1):
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    response = await asyncio.wait_for(model.generate_content_async(prompt, **kwargs), remaining)
+                    if kwargs.get("stream"):
+                        status = "streaming"
+                        return _HeldStream(response, release)
+                    lane.latencies.append(time.monotonic() - started)
+                    status = "ok"
+                    return response
+                except asyncio.TimeoutError:
+                    lane.counts["timeouts"] += 1
+                    status = "timeout"
+                    raise
+                except RETRYABLE_ERRORS as e:
+                    delay = self.retry_backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                    if attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                        lane.counts["errors"] += 1
+                        raise
+                    print(f"Gemini {name} returned {e}; retrying in {delay:.2f}s.")
+                    lane.counts["retries"] += 1
+                    await asyncio.sleep(delay)
+                except Exception:
+                    lane.counts["errors"] += 1
+                    raise
+        finally:
+            if status != "streaming":
+                release(status)
+
+    @staticmethod
+    def _release(lane: _ModelLane, name: str, started: float, status: str):
+        lane.in_flight -= 1
+        lane.semaphore.release()
+        GEMINI_REQUEST_SECONDS.labels(model=name, status=status).observe(time.monotonic() - started)
+
+    def hedge_budget(self, model) -> float | None:
+        """Seconds to wait for `model` before hedging: the configured value, else its observed p95."""
+        if self.hedge_after:
+            return self.hedge_after
+        lane = self._lane(model_name(model))
+        if len(lane.latencies) < self.min_hedge_samples:
+            return None
+        return lane.percentile(0.95)
+
+    async def generate_hedged(self, primary, hedge, prompt, timeout: float = None, **kwargs):
+        """
+        Calls `primary`, and if it has not answered within its hedge budget,
+        also calls `hedge`; returns the first successful response and cancels
+        the other request. Behaves like `generate` when hedging is disabled or
+        no budget is known yet.
+        """
+        budget = self.hedge_budget(primary)
+        if not config.GEMINI_HEDGING_ENABLED or hedge is None or budget is None:
+            return await self.generate(primary, prompt, timeout=timeout, **kwargs)
+
+        primary_task = asyncio.create_task(self.generate(primary, prompt, timeout=timeout, **kwargs))
+        pending = {primary_task}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=budget)
+            if done:
+                return primary_task.result()
+
+            self.hedge_stats["hedged"] += 1
+            hedge_task = asyncio.create_task(self.generate(hedge, prompt, timeout=timeout, **kwargs))
+            pending.add(hedge_task)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge_task:
+                            self.hedge_stats["hedge_wins"] += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        """Queue depth, in-flight requests, counters and latency percentiles per model."""
+        models = {}
+        for name, lane in self._lanes.items():
+            p50, p95 = lane.percentile(0.5), lane.percentile(0.95)
+            models[name] = {
+                "queued": lane.waiting,
+                "in_flight": lane.in_flight,
+                "concurrency": lane.concurrency,
+                **lane.counts,
+                "p50_ms": round(p50 * 1000) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000) if p95 is not None else None,
+            }
+        return {"models": models, **self.hedge_stats}
+
+
+gemini_governor = GeminiGovernor()
@@ -0,0 +1,187 @@
+import asyncio
+import time
+from datetime import timedelta
+from typing import Callable
+
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+from src.config import config
+from src.metrics import NOTIFICATIONS
+
+
+class TokenBucket:
+    """A token bucket refilled continuously at `rate` tokens per second."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, self._blocked_until - now)
+        if self._tokens < 1:
+            wait = max(wait, (1 - self._tokens) / self.rate)
+        return wait
+
+    async def acquire(self):
+        while (wait := self.delay()) > 0:
+            await asyncio.sleep(wait)
+        self._tokens -= 1
+
+    def pause(self, seconds: float):
+        """Blocks the bucket for `seconds`, e.g. when Telegram answers with RetryAfter."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    @property
+    def idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self._tokens >= self.capacity and self._blocked_until <= time.monotonic()
+
+
+class NotificationDispatcher:
+    """
+    Queues outbound Telegram messages and sends them at the fastest legal rate.
+
+    Worker tasks take messages from an async queue and pass them through a
+    global token bucket and a per-chat token bucket before sending. RetryAfter
+    responses pause the affected buckets for the time Telegram asks for, and
+    other transient errors are retried with backoff up to `max_retries` times.
+    `on_delivered` is called only after a successful send.
+
+    Use as an async context manager: leaving the block waits for the queue to
+    drain, unless the block is exiting because of an exception or cancellation.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        workers: int = None,
+        global_rate: float = None,
+        per_chat_rate: float = None,
+        max_retries: int = None,
+        retry_backoff: float = 1.0,
+    ):
+        self.bot = bot
+        self.workers = workers or config.NOTIFY_WORKERS
+        self.per_chat_rate = per_chat_rate or config.NOTIFY_PER_CHAT_RATE
+        self.max_retries = config.NOTIFY_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = retry_backoff
+        global_rate = global_rate or config.NOTIFY_GLOBAL_RATE
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self.stats = {"sent": 0, "failed": 0, "retried": 0, "rate_limited": 0}
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop(drain=exc_type is None)
+
+    def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, drain: bool = True):
+        """Stops the workers, optionally waiting for queued messages to be sent first."""
+        if drain and self._queue is not None:
+            await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def send(
+        self,
+        chat_id: int,
+        text: str,
+        on_delivered: Callable[[], None] = None,
+        on_failed: Callable[[], None] = None,
+    ) -> asyncio.Future:
+        """
+        Queues a message. The returned future resolves to True once the message
+        is delivered, or False if it was given up on.
+        """
+        if not self._tasks:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((chat_id, text, on_delivered, on_failed, future))
+        return future
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10_000:
+                # Forget chats whose buckets have fully refilled.
+                self._chat_buckets = {k: b for k, b in self._chat_buckets.items() if not b.idle}
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, capacity=1)
+        return bucket
+
+    async def _worker(self):
+        while True:
+            chat_id, text, on_delivered, on_failed, future = await self._queue.get()
+            try:
+                delivered = await self._deliver(chat_id, text)
+                callback = on_delivered if delivered else on_failed
+                if callback is not None:
+                    try:
+                        callback()
+                    except Exception as e:
+                        print(f"Notification callback failed for {chat_id}: {e}")
+                if not future.done():
+                    future.set_result(delivered)
+            finally:
+                self._queue.task_done()
+
+    def _count(self, outcome: str):
+        self.stats[outcome] += 1
+        NOTIFICATIONS.labels(outcome=outcome).inc()
+
+    async def _deliver(self, chat_id: int, text: str) -> bool:
+        chat_bucket = self._chat_bucket(chat_id)
+        for attempt in range(self.max_retries + 1):
+            await chat_bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text)
+                self._count("sent")
+                return True
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                print(f"Rate limited sending to {chat_id}; retrying in {retry_after}s.")
+                self._count("rate_limited")
+                chat_bucket.pause(retry_after)
+                self.global_bucket.pause(retry_after)
+            except (Forbidden, BadRequest) as e:
+                # The user blocked the bot or the chat is gone; retrying will not help.
+                print(f"Failed to send message to {chat_id}: {e}")
+                break
+            except Exception as e:
+                print(f"Failed to send message to {chat_id} (attempt {attempt + 1}): {e}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+            if attempt < self.max_retries:
+                self._count("retried")
+        self._count("failed")
+        return False
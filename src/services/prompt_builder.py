@@ -0,0 +1,115 @@
+import json
+import re
+
+from src.config import config
+
+# Fields the summary prompt asks the model to discuss, most important first.
+# Payload keys are matched against these patterns; anything else is dropped.
+_FIELD_PRIORITY = [
+    re.compile(r"^(collection_)?name$"),
+    re.compile(r"floor"),
+    re.compile(r"volume"),
+    re.compile(r"holder"),
+    re.compile(r"change|trend|delta"),
+]
+# Keys whose value stands for the parent field, e.g. {"volume": {"value": 12.3}}.
+_VALUE_KEYS = {"value", "val", "amount"}
+
+SUMMARY_PROMPT_PREFIX = (
+    "Based on the following data for an NFT collection, generate a concise and insightful summary "
+    "for a potential investor or collector.\n"
+    "Highlight key metrics like floor price, volume, and number of holders. Mention any notable trends.\n"
+    "Keep the summary to 2-3 paragraphs.\n\n"
+    "Data (JSON): "
+)
+SUMMARY_PROMPT_SUFFIX = "\n\nSummary:"
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (about 4 characters per token for English and JSON)."""
+    return (len(text) + 3) // 4
+
+
+_STATIC_PROMPT_TOKENS = estimate_tokens(SUMMARY_PROMPT_PREFIX + SUMMARY_PROMPT_SUFFIX)
+
+
+def _round(value):
+    if isinstance(value, float):
+        return float(f"{value:.6g}")
+    return value
+
+
+def _flatten(data, parent: str = "", depth: int = 0, out: dict = None) -> dict:
+    """Flattens nested dicts (and the first item of lists of dicts) into {field: scalar}."""
+    out = {} if out is None else out
+    if depth > 4:
+        return out
+    if isinstance(data, list):
+        if data and isinstance(data[0], dict):
+            _flatten(data[0], parent, depth + 1, out)
+        return out
+    if not isinstance(data, dict):
+        return out
+    # In a metric object like {"value": 12.3, "unit": "eth"} the siblings of
+    # the value describe the parent field, so they are named after it.
+    is_metric = bool(parent) and any(str(k).lower() in _VALUE_KEYS for k in data)
+    for key, value in data.items():
+        key = str(key)
+        if is_metric:
+            name = parent if key.lower() in _VALUE_KEYS else f"{parent}_{key}"
+        else:
+            name = key
+        if isinstance(value, (dict, list)):
+            _flatten(value, name, depth + 1, out)
+        elif value is not None and not isinstance(value, bool):
+            if name in out and parent:
+                name = f"{parent}_{key}"
+            out.setdefault(name, _round(value))
+    return out
+
+
+def project_metrics(collection_data: dict) -> dict:
+    """
+    Keeps only the fields the summary uses (name, floor price, volume,
+    holders, trend deltas), ordered by importance. Payloads with none of
+    those fields are passed through flattened, so the budget still applies.
+    """
+    fields = _flatten(collection_data)
+    projected = {}
+    for pattern in _FIELD_PRIORITY:
+        for name, value in fields.items():
+            if name not in projected and pattern.search(name.lower()):
+                projected[name] = value
+    return projected or fields
+
+
+def build_summary_prompt(collection_data: dict, token_budget: int = None) -> tuple[str, int]:
+    """
+    Builds the summary prompt from the projected metrics, serialized compactly.
+
+    Lower-priority fields are dropped until the estimated prompt size fits
+    `token_budget` (SUMMARY_PROMPT_TOKEN_BUDGET by default).
+
+    Returns:
+        The prompt and its estimated token count.
+    """
+    token_budget = token_budget or config.SUMMARY_PROMPT_TOKEN_BUDGET
+
+    projected = project_metrics(collection_data)
+    data = json.dumps(projected, separators=(",", ":"), ensure_ascii=False, default=str)
+    while projected and _STATIC_PROMPT_TOKENS + estimate_tokens(data) > token_budget:
+        projected.pop(next(reversed(projected)))
+        data = json.dumps(projected, separators=(",", ":"), ensure_ascii=False, default=str)
+
+    prompt = SUMMARY_PROMPT_PREFIX + data + SUMMARY_PROMPT_SUFFIX
+    return prompt, _STATIC_PROMPT_TOKENS + estimate_tokens(data)
+
+
+def log_prompt_tokens(label: str, estimated: int, response) -> int | None:
+    """Logs the estimated and measured prompt size of a Gemini call; returns the measured count."""
+    usage = getattr(response, "usage_metadata", None)
+    measured = getattr(usage, "prompt_token_count", None)
+    if not isinstance(measured, int):
+        measured = None
+    print(f"{label} prompt tokens: estimated {estimated}, measured {measured}")
+    return measured
@@ -1,5 +1,10 @@
+import asyncio
+import time
 import httpx
+from src.cache import TTLCache
 from src.config import config
+from src.metrics import UNLEASH_REQUEST_SECONDS, endpoint_label
+from src.services.collection_index import CollectionIndex
 
 BASE_URL = "https://api.unleashnfts.com/api/v1"
 
@@ -10,35 +15,92 @@ class UnleashNFTsService:
             "accept": "application/json",
             "x-api-key": self.api_key
         }
+        self._client: httpx.AsyncClient | None = None
+        self.collection_index = CollectionIndex(min_similarity=config.COLLECTION_INDEX_MIN_SIMILARITY)
+        self._index_task: asyncio.Task | None = None
+        self.metrics_cache = TTLCache(
+            maxsize=config.METRICS_CACHE_MAX_ENTRIES, ttl=config.METRICS_CACHE_TTL_SECONDS
+        )
+
+    def _build_client(self) -> httpx.AsyncClient:
+        """Builds the pooled client used for every request to the API."""
+        limits = httpx.Limits(
+            max_connections=config.UNLEASH_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.UNLEASH_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=config.UNLEASH_HTTP_KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(
+            config.UNLEASH_HTTP_READ_TIMEOUT,
+            connect=config.UNLEASH_HTTP_CONNECT_TIMEOUT,
+            pool=config.UNLEASH_HTTP_POOL_TIMEOUT,
+        )
+        http2 = config.UNLEASH_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("HTTP/2 requested for UnleashNFTs but the 'h2' package is not installed; using HTTP/1.1.")
+                http2 = False
+        return httpx.AsyncClient(
+            base_url=BASE_URL,
+            headers=self.headers,
+            limits=limits,
+            timeout=timeout,
+            http2=http2,
+        )
+
+    async def start(self):
+        """Opens the shared HTTP client. Called from the bot's post_init hook."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+
+    async def close(self):
+        """Closes the shared HTTP client. Called from the bot's post_shutdown hook."""
+        await self.stop_index_refresh()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def _request(self, method: str, endpoint: str, params: dict = None):
         """Helper function to make requests to the API."""
-        async with httpx.AsyncClient() as client:
-            try:
-                print(f"Making request to {BASE_URL}{endpoint} with params {params}")
-                response = await client.request(
-                    method, f"{BASE_URL}{endpoint}", headers=self.headers, params=params
-                )
-                print(f"Response status code: {response.status_code}")
-                print(f"Response content: {response.text}")
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                print(f"HTTP error occurred: {e}")
-                return None
-            except httpx.RequestError as e:
-                print(f"An error occurred while requesting {e.request.url!r}.")
-                return None
-            except httpx.RequestError as e:
-                print(f"An error occurred while requesting {e.request.url!r}.")
-                return None
-
-    async def get_collection_metrics(self, blockchain: str, address: str):
-        """Get metrics for a specific collection."""
+        if self._client is None or self._client.is_closed:
+            # Standalone scripts and tests don't run the bot's startup hooks.
+            await self.start()
+        started = time.perf_counter()
+        status = "error"
+        try:
+            print(f"Making request to {BASE_URL}{endpoint} with params {params}")
+            response = await self._client.request(method, endpoint, params=params)
+            status = str(response.status_code)
+            print(f"Response status code: {response.status_code}")
+            print(f"Response content: {response.text}")
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            print(f"HTTP error occurred: {e}")
+            return None
+        except httpx.RequestError as e:
+            print(f"An error occurred while requesting {e.request.url!r}.")
+            return None
+        finally:
+            UNLEASH_REQUEST_SECONDS.labels(endpoint=endpoint_label(endpoint), status=status).observe(
+                time.perf_counter() - started
+            )
+
+    async def get_collection_metrics(self, blockchain: str, address: str, metrics: str = "volume"):
+        """
+        Get metrics for a specific collection.
+
+        Responses are cached for a short TTL, and concurrent requests for the
+        same collection share a single upstream call. Failed requests are not cached.
+        """
         endpoint = f"/collection/{blockchain}/{address}/metrics"
         # The 'metrics' parameter is required by the API.
-        params = {"metrics": "volume"}
-        return await self._request("GET", endpoint, params=params)
+        params = {"metrics": metrics}
+        key = (str(blockchain), address.lower(), metrics)
+        return await self.metrics_cache.get_or_load(
+            key, lambda: self._request("GET", endpoint, params=params)
+        )
 
     async def get_collection_nfts(self, blockchain: str, address: str, limit: int = 50):
         """Get NFTs for a specific collection."""
@@ -57,22 +119,78 @@ class UnleashNFTsService:
         endpoint = "/market/trend"
         return await self._request("GET", endpoint)
 
+    @staticmethod
+    def _collections_params(limit: int, offset: int) -> dict:
+        return {
+            "blockchain": 1,  # Default to Ethereum
+            "metrics": "volume",
+            "sort_by": "volume",
+            "sort_order": "desc",
+            "time_range": "24h",
+            "limit": limit,
+            "offset": offset
+        }
+
+    async def refresh_collection_index(self, limit: int = 100, max_pages: int = None):
+        """
+        Rebuilds the local collection index from the /collections endpoint.
+        The existing index is kept if the first page cannot be fetched.
+        """
+        max_pages = max_pages or config.COLLECTION_INDEX_MAX_PAGES
+        collections = []
+        for page in range(max_pages):
+            collections_data = await self._request(
+                "GET", "/collections", params=self._collections_params(limit, page * limit)
+            )
+            if not collections_data or not collections_data.get("collections"):
+                break
+            collections.extend(collections_data["collections"])
+
+        if not collections:
+            print("Collection index refresh returned no collections; keeping the previous index.")
+            return
+        self.collection_index.build(collections)
+        print(f"Collection index refreshed with {len(collections)} collections.")
+
+    async def _index_refresh_loop(self, interval: float):
+        while True:
+            try:
+                await self.refresh_collection_index()
+            except Exception as e:
+                print(f"Collection index refresh failed: {e}")
+            await asyncio.sleep(interval)
+
+    def start_index_refresh(self, interval: float = None):
+        """Starts refreshing the collection index in the background."""
+        if self._index_task is None or self._index_task.done():
+            interval = interval or config.COLLECTION_INDEX_REFRESH_SECONDS
+            self._index_task = asyncio.create_task(self._index_refresh_loop(interval))
+
+    async def stop_index_refresh(self):
+        """Cancels the background index refresh, if running."""
+        if self._index_task is not None:
+            self._index_task.cancel()
+            try:
+                await self._index_task
+            except asyncio.CancelledError:
+                pass
+            self._index_task = None
+
     async def search_collection(self, name: str, limit: int = 100, max_pages: int = 20):
         """
-        Search for a collection by name across multiple pages and return the best match.
+        Search for a collection by name and return the best match.
+
+        The local collection index is consulted first; the live paged search
+        across the API is only used when the index has no match.
         """
+        match = self.collection_index.lookup(name)
+        if match:
+            return match
+
         endpoint = "/collections"
         for page in range(max_pages):
             offset = page * limit
-            params = {
-                "blockchain": 1,  # Default to Ethereum
-                "metrics": "volume",
-                "sort_by": "volume",
-                "sort_order": "desc",
-                "time_range": "24h",
-                "limit": limit,
-                "offset": offset
-            }
+            params = self._collections_params(limit, offset)
             collections_data = await self._request("GET", endpoint, params=params)
 
             if not collections_data or not collections_data.get("collections"):
@@ -0,0 +1,48 @@
+import pytest
+
+from src.database.alert_index import AlertIndex
+
+
+@pytest.fixture
+def alert_index():
+    index = AlertIndex()
+    index.rebuild([
+        (1, "1", "0xABC", "below", 10.0),
+        (2, "1", "0xabc", "below", 8.0),
+        (3, "1", "0xabc", "below", 9.5),
+        (4, "1", "0xabc", "above", 12.0),
+        (5, "1", "0xabc", "above", 9.0),
+        (6, "1", "0xdef", "below", 100.0),
+    ])
+    return index
+
+
+def test_rebuild_groups_by_collection(alert_index):
+    """Test that alerts are grouped per (chain, lowercased address)."""
+    assert alert_index.loaded
+    assert len(alert_index) == 6
+    assert len(alert_index.collections()) == 2
+    assert alert_index.alert_count(AlertIndex.collection_key("1", "0xABC")) == 5
+
+
+def test_triggered_uses_strict_comparisons(alert_index):
+    """Test that only thresholds strictly crossed by the floor price trigger."""
+    key = AlertIndex.collection_key("1", "0xabc")
+
+    assert sorted(alert_index.triggered(key, 9.5)) == [1, 5]
+    assert sorted(alert_index.triggered(key, 7.0)) == [1, 2, 3]
+    assert sorted(alert_index.triggered(key, 13.0)) == [4, 5]
+    assert alert_index.triggered(AlertIndex.collection_key("1", "0xmissing"), 1.0) == []
+
+
+def test_add_and_remove_keep_index_current(alert_index):
+    """Test incremental maintenance as alerts are created and deactivated."""
+    key = AlertIndex.collection_key("1", "0xabc")
+    alert_index.add(7, "1", "0xabc", "below", 11.0)
+    assert 7 in alert_index.triggered(key, 10.5)
+
+    alert_index.remove([1, 7, 6])
+
+    assert len(alert_index) == 4
+    assert sorted(alert_index.triggered(key, 7.0)) == [2, 3]
+    assert len(alert_index.collections()) == 1
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+
+from src.nlu.batcher import MicroBatcher
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_batch():
+    """Test that requests inside the window are sent together and routed back in order."""
+    batches = []
+
+    async def run_batch(items):
+        batches.append(list(items))
+        return [item.upper() for item in items]
+
+    async def run_single(item):
+        raise AssertionError("single path should not be used")
+
+    batcher = MicroBatcher(run_batch, run_single, max_batch_size=10, max_wait=0.01)
+
+    results = await asyncio.gather(*(batcher.submit(word) for word in ["a", "b", "c"]))
+
+    assert results == ["A", "B", "C"]
+    assert batches == [["a", "b", "c"]]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_immediately():
+    """Test that reaching max_batch_size flushes without waiting for the window."""
+    batches = []
+
+    async def run_batch(items):
+        batches.append(len(items))
+        return list(items)
+
+    batcher = MicroBatcher(run_batch, None, max_batch_size=2, max_wait=10)
+
+    results = await asyncio.wait_for(asyncio.gather(batcher.submit(1), batcher.submit(2)), timeout=1)
+
+    assert results == [1, 2]
+    assert batches == [2]
+
+
+@pytest.mark.asyncio
+async def test_malformed_batch_falls_back_to_single_requests():
+    """Test that a wrong-length batch response is retried one request at a time."""
+    async def run_batch(items):
+        return ["only one"]
+
+    singles = []
+
+    async def run_single(item):
+        singles.append(item)
+        return f"single {item}"
+
+    batcher = MicroBatcher(run_batch, run_single, max_batch_size=10, max_wait=0.01)
+
+    results = await asyncio.gather(batcher.submit("x"), batcher.submit("y"))
+
+    assert results == ["single x", "single y"]
+    assert sorted(singles) == ["x", "y"]
+
+
+@pytest.mark.asyncio
+async def test_missing_items_fall_back_individually():
+    """Test that only the items without a batch result use the single path."""
+    async def run_batch(items):
+        return ["ok", None]
+
+    async def run_single(item):
+        return f"single {item}"
+
+    batcher = MicroBatcher(run_batch, run_single, max_batch_size=10, max_wait=0.01)
+
+    results = await asyncio.gather(batcher.submit("x"), batcher.submit("y"))
+
+    assert results == ["ok", "single y"]
+    assert batcher.stats["fallbacks"] == 1
@@ -1,12 +1,23 @@
 import pytest
 import asyncio
-from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy import select
+from unittest.mock import ANY, AsyncMock, MagicMock, patch
 
 from telegram import Update, User as TelegramUser
 from telegram.ext import ContextTypes
 
-from src.bot import start, handle_message
-from src.database.models import User
+from src.bot import start, handle_message, stream_to_message
+from src.database.manager import DatabaseManager
+from src.database.models import PriceAlert, User
+
+
+@pytest.fixture(autouse=True)
+def unknown_collections():
+    """Handlers look up known collections first; by default none are known."""
+    with patch('src.bot.db_manager.find_collection', AsyncMock(return_value=None)) as find, \
+            patch('src.bot.db_manager.get_or_create_collection', AsyncMock(return_value=7)), \
+            patch('src.bot.db_manager.add_collection_alias', AsyncMock()):
+        yield find
 
 @pytest.mark.asyncio
 async def test_start_command():
@@ -77,12 +88,132 @@ async def test_handle_message_price_alert_intent(mock_classify_intent, mock_get_
     mock_get_or_create_user.assert_called_once()
     mock_search_collection.assert_called_once_with(collection_name)
     mock_create_price_alert.assert_called_once()
+    assert mock_create_price_alert.call_args.args[1]["collection_id"] == 7
     
     # Check that the confirmation message is sent
     update.message.reply_text.assert_called_with("✅ Alert set! I'll notify you if Doodles goes below 10 ETH.")
 
 
 @pytest.mark.asyncio
+@patch('src.bot.unleash_nfts_service.search_collection')
+@patch('src.bot.db_manager.create_price_alert')
+@patch('src.bot.db_manager.get_or_create_user')
+@patch('src.bot.classify_intent_and_extract_entities')
+async def test_handle_message_reuses_known_collection(mock_classify_intent, mock_get_or_create_user, mock_create_price_alert, mock_search_collection, unknown_collections):
+    """Test that a collection already in the collections table is not searched for again."""
+    # Arrange
+    mock_classify_intent.return_value = {
+        "intent": "set_price_alert",
+        "entities": {"collection_name": "doodles", "threshold_price": 10, "direction": "below"},
+        "confidence": 0.98
+    }
+    unknown_collections.return_value = {
+        "metadata": {"name": "Doodles", "contract_address": "0xabc", "chain_id": 1},
+        "collection_id": 3,
+    }
+
+    update = MagicMock(spec=Update)
+    update.effective_user = TelegramUser(id=123, first_name="Test", is_bot=False)
+    update.message = AsyncMock()
+    update.message.text = "alert me if doodles drops below 10 eth"
+    update.message.reply_text = AsyncMock()
+
+    # Act
+    await handle_message(update, MagicMock(spec=ContextTypes.DEFAULT_TYPE))
+
+    # Assert
+    mock_search_collection.assert_not_called()
+    alert_data = mock_create_price_alert.call_args.args[1]
+    assert alert_data["collection_id"] == 3
+    assert alert_data["chain"] == "1"
+
+
+@pytest.mark.asyncio
+@patch('src.bot.unleash_nfts_service.search_collection')
+@patch('src.bot.classify_intent_and_extract_entities')
+async def test_handle_message_price_alert_holds_no_connection_during_search(mock_classify_intent, mock_search_collection, tmp_path):
+    """Test that no connection is checked out while the live collection search runs."""
+    # Arrange
+    manager = DatabaseManager(f"sqlite+aiosqlite:///{tmp_path / 'mira.db'}")
+    await manager.init_db()
+    await manager.get_or_create_user(123, "Test")  # A returning user, answered from the cache
+    mock_classify_intent.return_value = {
+        "intent": "set_price_alert",
+        "entities": {"collection_name": "doodles", "threshold_price": 10, "direction": "below"},
+        "confidence": 0.98
+    }
+    checked_out_during_search = []
+
+    async def search(name):
+        checked_out_during_search.append(manager.engine.sync_engine.pool.checkedout())
+        return {"metadata": {"name": "Doodles", "contract_address": "0xabc", "chain_id": 1}}
+
+    mock_search_collection.side_effect = search
+    sessions_opened = 0
+    open_session = manager.async_session
+
+    def counting_session():
+        nonlocal sessions_opened
+        sessions_opened += 1
+        return open_session()
+
+    update = MagicMock(spec=Update)
+    update.effective_user = TelegramUser(id=123, first_name="Test", is_bot=False)
+    update.message = AsyncMock()
+    update.message.text = "alert me if doodles drops below 10 eth"
+
+    # Act
+    with patch('src.bot.db_manager', manager), patch.object(manager, "async_session", counting_session):
+        await handle_message(update, MagicMock(spec=ContextTypes.DEFAULT_TYPE))
+
+    # Assert
+    assert checked_out_during_search == [0]
+    assert sessions_opened == 2  # The alias lookup, then recording the collection with the alert
+    async with manager.async_session() as session:
+        alert = await session.scalar(select(PriceAlert))
+    assert alert.collection_id is not None and alert.threshold_price == 10
+    await manager.engine.dispose()
+
+
+@pytest.mark.asyncio
+@patch('src.bot.unleash_nfts_service.search_collection')
+@patch('src.bot.classify_intent_and_extract_entities')
+async def test_handle_message_remembers_typed_collection_names(mock_classify_intent, mock_search_collection):
+    """Test that a name the search resolved once is answered from its recorded alias next time."""
+    # Arrange
+    manager = DatabaseManager("sqlite+aiosqlite:///:memory:")
+    await manager.init_db()
+    mock_classify_intent.return_value = {
+        "intent": "set_price_alert",
+        "entities": {"collection_name": "bored apes", "threshold_price": 10, "direction": "below"},
+        "confidence": 0.98
+    }
+    mock_search_collection.return_value = {
+        "metadata": {"name": "Bored Ape Yacht Club", "contract_address": "0xbc4c", "chain_id": 1}
+    }
+    update = MagicMock(spec=Update)
+    update.effective_user = TelegramUser(id=123, first_name="Test", is_bot=False)
+    update.message = AsyncMock()
+    update.message.text = "alert me if bored apes drops below 10 eth"
+
+    # Act
+    with patch('src.bot.db_manager', manager):
+        await handle_message(update, MagicMock(spec=ContextTypes.DEFAULT_TYPE))
+        await handle_message(update, MagicMock(spec=ContextTypes.DEFAULT_TYPE))
+
+    # Assert
+    mock_search_collection.assert_called_once_with("bored apes")
+    async with manager.async_session() as session:
+        alerts = (await session.execute(select(PriceAlert))).scalars().all()
+    assert len(alerts) == 2 and alerts[0].collection_id == alerts[1].collection_id
+    update.message.reply_text.assert_called_with(
+        "✅ Alert set! I'll notify you if Bored Ape Yacht Club goes below 10 ETH."
+    )
+    await manager.engine.dispose()
+
+
+@pytest.mark.asyncio
+@patch('src.bot.config.SUMMARY_STREAMING', False)
 @patch('src.bot.gemini_service.generate_summary')
 @patch('src.bot.unleash_nfts_service.get_collection_metrics')
 @patch('src.bot.unleash_nfts_service.search_collection')
@@ -121,12 +252,72 @@ async def test_handle_message_summary_intent(mock_classify_intent, mock_get_or_c
     mock_classify_intent.assert_called_once_with(user_input)
     mock_search_collection.assert_called_once_with(collection_name)
     mock_get_metrics.assert_called_once_with(search_response["metadata"]["chain_id"], search_response["metadata"]["contract_address"])
-    mock_generate_summary.assert_called_once_with(metrics_response)
+    mock_generate_summary.assert_called_once_with(
+        metrics_response,
+        chain=search_response["metadata"]["chain_id"],
+        address=search_response["metadata"]["contract_address"],
+    )
     
     # Check that the final summary is sent
     update.message.reply_text.assert_called_with(summary_response)
 
 
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+@pytest.mark.asyncio
+@patch('src.bot.config.SUMMARY_STREAMING', True)
+@patch('src.bot.gemini_service.stream_summary')
+@patch('src.bot.unleash_nfts_service.get_collection_metrics')
+@patch('src.bot.unleash_nfts_service.search_collection')
+@patch('src.bot.db_manager.get_or_create_user')
+@patch('src.bot.classify_intent_and_extract_entities')
+async def test_handle_message_summary_intent_streams_into_placeholder(mock_classify_intent, mock_get_or_create_user, mock_search_collection, mock_get_metrics, mock_stream_summary):
+    """Test that a streamed summary is edited into the 'Fetching summary' placeholder."""
+    # Arrange
+    mock_classify_intent.return_value = {
+        "intent": "get_project_summary",
+        "entities": {"collection_name": "doodles"},
+        "confidence": 0.9
+    }
+    mock_search_collection.return_value = {"metadata": {"name": "Doodles", "contract_address": "0x123", "chain_id": 1}}
+    mock_get_metrics.return_value = {"stats": {"floor_price": 1.2}}
+    mock_stream_summary.return_value = _chunks("Doodles is ", "a collection.")
+
+    placeholder = AsyncMock()
+    update = MagicMock(spec=Update)
+    update.message = AsyncMock()
+    update.message.text = "summarize doodles"
+    update.message.reply_text = AsyncMock(return_value=placeholder)
+
+    # Act
+    await handle_message(update, MagicMock(spec=ContextTypes.DEFAULT_TYPE))
+
+    # Assert
+    mock_stream_summary.assert_called_once_with({"stats": {"floor_price": 1.2}}, chain=1, address="0x123")
+    update.message.reply_text.assert_called_with("Fetching summary for Doodles...")
+    placeholder.edit_text.assert_called_with("Doodles is a collection.")
+
+
+@pytest.mark.asyncio
+async def test_stream_to_message_throttles_edits_and_splits_long_text():
+    """Test that edits are throttled, the last edit is complete and overflow goes to new messages."""
+    # Arrange
+    placeholder = AsyncMock()
+    reply_to = AsyncMock()
+    parts = ["a" * 3000, "b" * 3000]
+
+    # Act
+    text = await stream_to_message(reply_to, placeholder, _chunks(*parts), edit_interval=60)
+
+    # Assert
+    assert text == "".join(parts)
+    assert [c.args[0] for c in placeholder.edit_text.call_args_list] == ["a" * 3000, ("a" * 3000 + "b" * 3000)[:4096]]
+    reply_to.reply_text.assert_called_once_with(("a" * 3000 + "b" * 3000)[4096:])
+
+
 @pytest.mark.asyncio
 @patch('src.bot.db_manager.get_or_create_user')
 @patch('src.bot.classify_intent_and_extract_entities')
@@ -274,7 +465,7 @@ async def test_handle_message_track_wallet_intent(mock_classify_intent, mock_get
     # Assert
     mock_classify_intent.assert_called_once_with(user_input)
     mock_get_or_create_user.assert_called_once()
-    mock_create_tracked_wallet.assert_called_once_with(mock_get_or_create_user.return_value, wallet_address)
+    mock_create_tracked_wallet.assert_called_once_with(mock_get_or_create_user.return_value, wallet_address, uow=ANY)
     
     update.message.reply_text.assert_called_with(f"✅ Wallet tracking enabled! I'll monitor {wallet_address} for NFT activity.")
 
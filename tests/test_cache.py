@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from src.cache import TTLCache
+
+
+def test_lru_eviction():
+    """Test that the least recently used entry is evicted when full."""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_ttl_expiry():
+    """Test that entries expire after the TTL."""
+    cache = TTLCache(maxsize=2, ttl=30)
+    with patch("src.cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+    with patch("src.cache.time.monotonic", return_value=129.0):
+        assert cache.get("a") == 1
+    with patch("src.cache.time.monotonic", return_value=131.0):
+        assert cache.get("a") is None
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_get_or_load_single_flight():
+    """Test that concurrent misses for one key run the loader once."""
+    cache = TTLCache()
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(10)))
+
+    assert results == ["value"] * 10
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_get_or_load_does_not_cache_rejected_values():
+    """Test that values rejected by should_cache are not stored."""
+    cache = TTLCache()
+
+    async def loader():
+        return None
+
+    assert await cache.get_or_load("k", loader) is None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_get_or_load_propagates_errors_to_waiters():
+    """Test that a loader failure reaches every coalesced caller and is not cached."""
+    cache = TTLCache()
+
+    async def loader():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_get_or_load_survives_leader_cancellation():
+    """Test that a caller timing out does not cancel the shared load for other callers."""
+    cache = TTLCache()
+
+    async def loader():
+        await asyncio.sleep(0.05)
+        return "value"
+
+    leader = asyncio.create_task(asyncio.wait_for(cache.get_or_load("k", loader), 0.01))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get_or_load("k", loader))
+
+    with pytest.raises(asyncio.TimeoutError):
+        await leader
+    assert await follower == "value"
+    assert cache.get("k") == "value"
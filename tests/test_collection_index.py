@@ -0,0 +1,73 @@
+import pytest
+import respx
+from httpx import Response
+
+from src.services.collection_index import CollectionIndex, normalize_name
+from src.services.unleashnfts_api import UnleashNFTsService, BASE_URL
+
+
+def _collection(name, address):
+    return {"metadata": {"name": name, "contract_address": address, "chain_id": 1}}
+
+
+@pytest.fixture
+def index():
+    """Fixture with collections in API (volume-descending) order."""
+    index = CollectionIndex(min_similarity=0.5)
+    index.build([
+        _collection("CryptoDoodles", "0x1"),
+        _collection("Bored Ape Yacht Club", "0x2"),
+        _collection("Doodles", "0x3"),
+        _collection("Azuki", "0x4"),
+        _collection("Doodles", "0x5"),
+    ])
+    return index
+
+
+def test_normalize_name():
+    assert normalize_name("  Bored-Ape   Yacht_Club! ") == "bored ape yacht club"
+
+
+def test_lookup_exact_beats_earlier_partial_match(index):
+    """An exact match wins even when a higher-volume collection contains the name."""
+    assert index.lookup("DOODLES")["metadata"]["contract_address"] == "0x3"
+
+
+def test_lookup_prefix(index):
+    assert index.lookup("bored ape")["metadata"]["contract_address"] == "0x2"
+
+
+def test_lookup_substring(index):
+    assert index.lookup("yacht club")["metadata"]["contract_address"] == "0x2"
+
+
+def test_lookup_fuzzy(index):
+    assert index.lookup("azukii")["metadata"]["contract_address"] == "0x4"
+
+
+def test_lookup_miss(index):
+    assert index.lookup("pudgy penguins") is None
+    assert CollectionIndex().lookup("doodles") is None
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_search_collection_uses_index_before_api():
+    """Test that a refreshed index answers searches without paging the API."""
+    # Arrange
+    service = UnleashNFTsService()
+    route = respx.get(f"{BASE_URL}/collections")
+    route.side_effect = [
+        Response(200, json={"collections": [_collection("Doodles", "0x123")]}),
+        Response(200, json={"collections": []}),
+    ]
+    await service.refresh_collection_index()
+    assert route.call_count == 2
+
+    # Act
+    result = await service.search_collection("doodles")
+
+    # Assert
+    assert result["metadata"]["contract_address"] == "0x123"
+    assert route.call_count == 2
+    await service.close()
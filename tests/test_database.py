@@ -1,6 +1,11 @@
+import asyncio
+from unittest.mock import patch
+
 import pytest
+from sqlalchemy import select
+
 from src.database.manager import DatabaseManager
-from src.database.models import User
+from src.database.models import User, PriceAlert
 
 @pytest.fixture
 async def db_manager():
@@ -32,6 +37,22 @@ async def test_get_or_create_user_existing(db_manager: DatabaseManager):
     # Assert
     assert user.telegram_user_id == 123
 
+@pytest.mark.asyncio
+async def test_get_or_create_user_upserts_once_and_caches(db_manager: DatabaseManager):
+    """Concurrent and repeat lookups create a single row and skip the DB once cached."""
+    # Act
+    users = await asyncio.gather(*(db_manager.get_or_create_user(456, "Test") for _ in range(5)))
+    db_manager.user_ids.clear()
+    uncached = await db_manager.get_or_create_user(456, "Test")
+    with patch.object(db_manager, "async_session", side_effect=AssertionError("DB was queried")):
+        cached = await db_manager.get_or_create_user(456, "Test")
+
+    # Assert
+    async with db_manager.async_session() as session:
+        rows = (await session.execute(select(User).filter_by(telegram_user_id=456))).scalars().all()
+    assert len(rows) == 1
+    assert {u.id for u in users} == {uncached.id, cached.id} == {rows[0].id}
+
 @pytest.mark.asyncio
 async def test_create_price_alert(db_manager: DatabaseManager):
     """Test creating a price alert."""
@@ -55,6 +76,51 @@ async def test_create_price_alert(db_manager: DatabaseManager):
     assert alert.direction == "below"
 
 
+@pytest.mark.asyncio
+async def test_unit_of_work_bulk_inserts_commit_together(db_manager: DatabaseManager):
+    """Test bulk inserts sharing one transaction, with the alert index updated only on commit."""
+    # Arrange
+    user = await db_manager.get_or_create_user(123, "Test")
+    alerts_data = [
+        {"collection_name": "Doodles", "collection_address": "0x123", "chain": "1",
+         "threshold_price": price, "direction": "below"}
+        for price in (1.0, 2.0, 3.0)
+    ]
+    await db_manager.rebuild_alert_index()
+
+    # Act
+    async with db_manager.unit_of_work() as uow:
+        alerts = await db_manager.create_price_alerts(user, alerts_data, uow=uow)
+        wallets = await db_manager.create_tracked_wallets(user, ["0xaaa", "0xbbb"], uow=uow)
+        indexed_before_commit = len(db_manager.alert_index)
+
+    # Assert
+    assert [a.threshold_price for a in alerts] == [1.0, 2.0, 3.0]
+    assert all(a.id is not None and a.is_active for a in alerts)
+    assert [w.wallet_address for w in wallets] == ["0xaaa", "0xbbb"]
+    assert indexed_before_commit == 0
+    assert len(db_manager.alert_index) == 3
+
+@pytest.mark.asyncio
+async def test_unit_of_work_rolls_back_on_error(db_manager: DatabaseManager):
+    """Test that a failing handler leaves neither rows nor index entries behind."""
+    # Arrange
+    user = await db_manager.get_or_create_user(123, "Test")
+    alert_data = {"collection_name": "Doodles", "collection_address": "0x123", "chain": "1",
+                  "threshold_price": 1.0, "direction": "below"}
+    await db_manager.rebuild_alert_index()
+
+    # Act
+    with pytest.raises(RuntimeError):
+        async with db_manager.unit_of_work() as uow:
+            await db_manager.create_price_alert(user, alert_data, uow=uow)
+            raise RuntimeError("handler failed")
+
+    # Assert
+    async with db_manager.async_session() as session:
+        assert (await session.execute(select(PriceAlert))).scalars().all() == []
+    assert len(db_manager.alert_index) == 0
+
 @pytest.mark.asyncio
 async def test_get_or_create_user_large_id(db_manager: DatabaseManager):
     """Test creating a user with a large Telegram ID that requires BigInteger."""
@@ -68,3 +134,129 @@ async def test_get_or_create_user_large_id(db_manager: DatabaseManager):
     assert user.telegram_user_id == large_telegram_id
     assert user.first_name == "BigIDUser"
     assert user.id is not None
+
+@pytest.mark.asyncio
+async def test_deactivate_price_alerts_in_chunks(db_manager: DatabaseManager):
+    """Test that alerts are deactivated by id with chunked bulk updates."""
+    # Arrange
+    user = await db_manager.get_or_create_user(123, "Test")
+    alert_data = {
+        "collection_name": "Doodles",
+        "collection_address": "0x123",
+        "chain": "ethereum",
+        "threshold_price": 10.5,
+        "direction": "below"
+    }
+    alerts = [await db_manager.create_price_alert(user, alert_data) for _ in range(5)]
+
+    # Act
+    updated = await db_manager.deactivate_price_alerts([a.id for a in alerts[:3]], chunk_size=2)
+
+    # Assert
+    assert updated == 3
+    async with db_manager.async_session() as session:
+        result = await session.execute(select(PriceAlert.id).where(PriceAlert.is_active == True))
+        assert sorted(result.scalars().all()) == sorted(a.id for a in alerts[3:])
+    assert await db_manager.deactivate_price_alerts([]) == 0
+
+@pytest.mark.asyncio
+async def test_alert_index_tracks_created_and_deactivated_alerts(db_manager: DatabaseManager):
+    """Test that the alert index follows alert creation and deactivation."""
+    # Arrange
+    user = await db_manager.get_or_create_user(123, "Test")
+    alert_data = {
+        "collection_name": "Doodles",
+        "collection_address": "0x123",
+        "chain": "1",
+        "threshold_price": 10.5,
+        "direction": "below"
+    }
+    await db_manager.rebuild_alert_index()
+
+    # Act
+    alert = await db_manager.create_price_alert(user, alert_data)
+    key = db_manager.alert_index.collection_key("1", "0x123", alert.collection_id)
+    triggered_before = db_manager.alert_index.triggered(key, 10.0)
+    await db_manager.deactivate_price_alerts([alert.id])
+
+    # Assert
+    assert triggered_before == [alert.id]
+    assert db_manager.alert_index.triggered(key, 10.0) == []
+    await db_manager.rebuild_alert_index()
+    assert len(db_manager.alert_index) == 0
+
+@pytest.mark.asyncio
+async def test_rebuild_alert_index_keeps_changes_made_during_the_scan(db_manager: DatabaseManager):
+    """Test that alerts created or deactivated mid-rebuild are not lost when the new index is swapped in."""
+    # Arrange
+    user = await db_manager.get_or_create_user(123, "Test")
+    alert_data = {"collection_name": "Doodles", "collection_address": "0x123", "chain": "1",
+                  "threshold_price": 10.5, "direction": "below"}
+    first, second = await db_manager.create_price_alerts(user, [alert_data, alert_data])
+    scan = db_manager.iter_active_price_alerts
+    created = []
+
+    async def racing_scan(chunk_size=None):
+        async for rows in scan(chunk_size=1):
+            yield rows
+            if rows[0][0] == first.id:
+                # Delivered and deactivated after the scan already passed it.
+                await db_manager.deactivate_price_alerts([first.id])
+        # Committed after the scan finished, but before the swap.
+        created.append(await db_manager.create_price_alert(user, alert_data))
+
+    # Act
+    with patch.object(db_manager, "iter_active_price_alerts", racing_scan):
+        index = await db_manager.rebuild_alert_index()
+
+    # Assert
+    key = index.collection_key("1", "0x123", first.collection_id)
+    assert sorted(index.triggered(key, 10.0)) == [second.id, created[0].id]
+    assert db_manager.alert_index is index
+
+@pytest.mark.asyncio
+async def test_iter_active_price_alerts_streams_in_chunks(db_manager: DatabaseManager):
+    """Test that active alerts are streamed in keyset-paginated chunks."""
+    # Arrange
+    user = await db_manager.get_or_create_user(123, "Test")
+    alert_data = {
+        "collection_name": "Doodles",
+        "collection_address": "0x123",
+        "chain": "ethereum",
+        "threshold_price": 10.5,
+        "direction": "below"
+    }
+    alerts = [await db_manager.create_price_alert(user, alert_data) for _ in range(5)]
+    await db_manager.deactivate_price_alerts([alerts[1].id])
+
+    # Act
+    chunks = [rows async for rows in db_manager.iter_active_price_alerts(chunk_size=2)]
+
+    # Assert
+    assert [len(rows) for rows in chunks] == [2, 2]
+    assert [row[0] for rows in chunks for row in rows] == [alerts[i].id for i in (0, 2, 3, 4)]
+    # Chain and address come from the linked, normalized collection row.
+    assert chunks[0][0] == (alerts[0].id, "1", "0x123", "below", 10.5, alerts[0].collection_id)
+
+@pytest.mark.asyncio
+async def test_collections_are_normalized_and_shared(db_manager: DatabaseManager):
+    """Test that alerts on the same collection share one normalized collections row."""
+    # Arrange
+    user = await db_manager.get_or_create_user(123, "Test")
+    metadata = {"name": "Doodles", "contract_address": "0xABC", "chain_id": 1, "image_url": "https://..."}
+    collection_id = await db_manager.get_or_create_collection(1, "0xABC", "Doodles", metadata)
+
+    # Act
+    legacy = await db_manager.create_price_alert(user, {
+        "collection_name": "Doodles", "collection_address": "0xabc", "chain": "ethereum",
+        "threshold_price": 1.0, "direction": "below",
+    })
+    await db_manager.add_collection_alias("the doodles", collection_id)
+    found = await db_manager.find_collection("The Doodles!")
+    again = await db_manager.get_or_create_collection("1", "0xabc", "Doodles", metadata)
+
+    # Assert
+    assert legacy.collection_id == again == collection_id
+    assert found == {"metadata": metadata, "collection_id": collection_id}  # kept by the alert's upsert
+    assert await db_manager.find_collection("unknown") is None
+    assert await db_manager.find_collection("Doodles") is None  # only typed aliases resolve
@@ -9,6 +9,7 @@ from telegram.ext import ContextTypes, Application
 from telegram import User as TelegramUser
 
 from src.bot import handle_message
+from src.database.alert_index import AlertIndex
 from src.database.manager import db_manager
 from src.database.models import User, PriceAlert
 from src.scheduler import check_price_alerts
@@ -21,12 +22,15 @@ async def setup_database():
     db_manager.async_session = sessionmaker(
         db_manager.engine, expire_on_commit=False, class_=AsyncSession
     )
+    db_manager.alert_index = AlertIndex()
+    db_manager.user_ids.clear()
     await db_manager.init_db()
     yield
     await db_manager.engine.dispose()
 
 
 @pytest.mark.asyncio
+@patch('src.bot.config.SUMMARY_STREAMING', False)
 @patch('src.bot.gemini_service.generate_summary')
 @patch('src.bot.unleash_nfts_service.get_collection_metrics')
 @patch('src.bot.unleash_nfts_service.search_collection')
@@ -0,0 +1,68 @@
+import pytest
+
+from src.nlu.fast_path import classify_fast
+
+WALLET = "0x" + "ab12" * 10
+
+
+@pytest.mark.parametrize("text", ["hi", "Hello!", "hey mira", "gm", "Good morning"])
+def test_greetings(text):
+    result = classify_fast(text)
+    assert result["intent"] == "greeting"
+    assert result["entities"] == {}
+
+
+@pytest.mark.parametrize("text", [WALLET, f"track {WALLET}", f"Monitor wallet {WALLET}"])
+def test_wallet_addresses(text):
+    result = classify_fast(text)
+    assert result["intent"] == "track_wallet"
+    assert result["entities"] == {"wallet_address": WALLET}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("alert me when Doodles goes above 5 ETH", ("Doodles", 5, "above")),
+    ("Notify me if the Bored Ape Yacht Club floor drops below 12.5 eth", ("Bored Ape Yacht Club", 12.5, "below")),
+    ("alert me when azuki is under 3", ("azuki", 3, "below")),
+    ("ping me once pudgy penguins rises over 10 ETH!", ("pudgy penguins", 10, "above")),
+])
+def test_price_alerts(text, expected):
+    result = classify_fast(text)
+    collection_name, threshold_price, direction = expected
+    assert result["intent"] == "set_price_alert"
+    assert result["entities"] == {
+        "collection_name": collection_name,
+        "threshold_price": threshold_price,
+        "direction": direction,
+    }
+    assert 0 < result["confidence"] <= 1
+    assert result["reasoning"]
+
+
+@pytest.mark.parametrize("text, collection_name", [
+    ("summary of Doodles", "Doodles"),
+    ("Give me a summary of the Azuki collection", "Azuki"),
+    ("summarize cryptopunks", "cryptopunks"),
+])
+def test_summaries(text, collection_name):
+    result = classify_fast(text)
+    assert result["intent"] == "get_project_summary"
+    assert result["entities"] == {"collection_name": collection_name}
+
+
+@pytest.mark.parametrize("text", ["market trends", "What are the NFT market trends?", "summary of the market"])
+def test_market_trends(text):
+    assert classify_fast(text)["intent"] == "get_market_trends"
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "Tell me about the Bored Ape Yacht Club collection",
+    "should I buy doodles or azuki?",
+    "hi, can you set an alert for doodles",
+    "alert me when doodles moons",
+    "alert me when doodles goes above 5 and below 3",
+    "tell me when the market is below 5",
+    "notify me if 10ktf drops below 2 eth",
+])
+def test_abstains(text):
+    assert classify_fast(text) is None
@@ -1,7 +1,16 @@
 import pytest
 from unittest.mock import AsyncMock, patch
 
-from src.services.gemini_ai import gemini_service
+from src.services.gemini_ai import SUMMARY_ERROR_MESSAGE, gemini_service
+
+@pytest.fixture(autouse=True)
+def clear_summary_cache():
+    """The service is a module-level singleton, so reset its summary cache per test."""
+    gemini_service.summary_cache.clear()
+    gemini_service.summary_requests.clear()
+    yield
+    gemini_service.summary_cache.clear()
+    gemini_service.summary_requests.clear()
 
 @pytest.mark.asyncio
 @patch('src.services.gemini_ai.genai.GenerativeModel.generate_content_async')
@@ -22,6 +31,50 @@ async def test_generate_summary_success(mock_generate_content):
     assert result == mock_response_text
     mock_generate_content.assert_called_once()
 
+class _StreamResponse:
+    def __init__(self, parts):
+        self.parts = parts
+
+    async def __aiter__(self):
+        for part in self.parts:
+            chunk = AsyncMock()
+            chunk.text = part
+            yield chunk
+
+@pytest.mark.asyncio
+@patch('src.services.gemini_ai.genai.GenerativeModel.generate_content_async')
+async def test_stream_summary_yields_chunks_and_caches(mock_generate_content):
+    """Test that a streamed summary yields chunks as they arrive and is then served from cache."""
+    # Arrange
+    collection_data = {"stats": {"floor_price": 1.5}}
+    mock_generate_content.return_value = _StreamResponse(["First part. ", "Second part."])
+
+    # Act
+    streamed = [c async for c in gemini_service.stream_summary(collection_data, chain=1, address="0xABC")]
+    cached = [c async for c in gemini_service.stream_summary(collection_data, chain=1, address="0xabc")]
+    summary = await gemini_service.generate_summary(collection_data, chain=1, address="0xabc")
+
+    # Assert
+    assert streamed == ["First part. ", "Second part."]
+    assert cached == ["First part. Second part."]
+    assert summary == "First part. Second part."
+    mock_generate_content.assert_called_once()
+    assert mock_generate_content.call_args.kwargs == {"stream": True}
+
+@pytest.mark.asyncio
+@patch('src.services.gemini_ai.genai.GenerativeModel.generate_content_async')
+async def test_stream_summary_failure(mock_generate_content):
+    """Test that a failed stream yields the error message and caches nothing."""
+    # Arrange
+    mock_generate_content.side_effect = Exception("API Error")
+
+    # Act
+    streamed = [c async for c in gemini_service.stream_summary({"name": "Test"})]
+
+    # Assert
+    assert streamed == [SUMMARY_ERROR_MESSAGE]
+    assert len(gemini_service.summary_cache) == 0
+
 @pytest.mark.asyncio
 @patch('src.services.gemini_ai.genai.GenerativeModel.generate_content_async')
 async def test_generate_summary_failure(mock_generate_content):
@@ -35,3 +88,71 @@ async def test_generate_summary_failure(mock_generate_content):
 
     # Assert
     assert "unable to generate a summary" in result
+
+
+@pytest.mark.asyncio
+@patch('src.services.gemini_ai.genai.GenerativeModel.generate_content_async')
+async def test_generate_summary_cached_by_collection_and_metrics(mock_generate_content):
+    """Test that unchanged metrics reuse the cached summary and changed metrics do not."""
+    # Arrange
+    mock_gemini_response = AsyncMock()
+    mock_gemini_response.text = "Cached summary."
+    mock_generate_content.return_value = mock_gemini_response
+
+    # Act
+    first = await gemini_service.generate_summary({"floor_price": 1.5, "volume": 10}, chain=1, address="0xABC")
+    second = await gemini_service.generate_summary({"volume": 10, "floor_price": 1.5}, chain=1, address="0xabc")
+    await gemini_service.generate_summary({"floor_price": 1.6, "volume": 10}, chain=1, address="0xabc")
+
+    # Assert
+    assert first == second == "Cached summary."
+    assert mock_generate_content.call_count == 2
+    assert gemini_service.summary_requests[("1", "0xabc")] == 3
+
+@pytest.mark.asyncio
+@patch('src.services.gemini_ai.genai.GenerativeModel.generate_content_async')
+async def test_generate_summary_failure_not_cached(mock_generate_content):
+    """Test that a failed generation is retried on the next request."""
+    mock_generate_content.side_effect = Exception("API Error")
+
+    await gemini_service.generate_summary({"floor_price": 1}, chain=1, address="0xabc")
+    await gemini_service.generate_summary({"floor_price": 1}, chain=1, address="0xabc")
+
+    assert mock_generate_content.call_count == 2
+
+@pytest.mark.asyncio
+@patch('src.services.gemini_ai.genai.GenerativeModel.generate_content_async')
+async def test_prewarm_popular_summaries(mock_generate_content):
+    """Test that the most requested collections get summaries generated ahead of time."""
+    # Arrange
+    mock_gemini_response = AsyncMock()
+    mock_gemini_response.text = "Pre-generated summary."
+    mock_generate_content.return_value = mock_gemini_response
+    gemini_service.summary_requests.update({("1", "0xpopular"): 5, ("1", "0xrare"): 1})
+    fetch_metrics = AsyncMock(return_value={"floor_price": 3})
+
+    # Act
+    await gemini_service.prewarm_popular_summaries(fetch_metrics, top_n=1)
+    summary = await gemini_service.generate_summary({"floor_price": 3}, chain="1", address="0xpopular")
+
+    # Assert
+    fetch_metrics.assert_called_once_with("1", "0xpopular")
+    assert summary == "Pre-generated summary."
+    mock_generate_content.assert_called_once()
+
+@patch('src.services.gemini_ai.config.SUMMARY_POPULARITY_MAX_ENTRIES', 4)
+def test_summary_popularity_is_bounded_and_decays():
+    """Test that request counts are capped in size and fade each prewarm cycle."""
+    # Arrange
+    gemini_service.summary_requests.update({("1", "0xold"): 8})
+
+    # Act
+    for i in range(4):
+        gemini_service._record_request(("1", f"0x{i}"))
+    gemini_service.decay_popularity(0.5)
+
+    # Assert
+    assert len(gemini_service.summary_requests) <= 4
+    assert gemini_service.summary_requests[("1", "0xold")] == 4
+    gemini_service.decay_popularity(0.05)
+    assert gemini_service.summary_requests == {("1", "0xold"): pytest.approx(0.2)}
@@ -0,0 +1,175 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from src.services.gemini_governor import GeminiGovernor
+
+
+def _model(name: str, handler):
+    """A stand-in GenerativeModel whose generate_content_async runs `handler`."""
+    model = MagicMock()
+    model.model_name = f"models/{name}"
+    model.generate_content_async = handler
+    return model
+
+
+@pytest.mark.asyncio
+@patch('src.services.gemini_governor.config.GEMINI_PRO_CONCURRENCY', 2)
+async def test_generate_limits_concurrency_per_model():
+    """No more than the model's concurrency limit is in flight; the rest queue."""
+    # Arrange
+    governor = GeminiGovernor(timeout=5)
+    active = peak = 0
+
+    async def handler(prompt, **kwargs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return prompt
+
+    model = _model("gemini-2.5-pro", handler)
+
+    # Act
+    results = await asyncio.gather(*(governor.generate(model, i) for i in range(6)))
+
+    # Assert
+    assert results == list(range(6))
+    assert peak == 2
+    stats = governor.stats()["models"]["gemini-2.5-pro"]
+    assert stats["calls"] == 6 and stats["queued"] == 0 and stats["in_flight"] == 0
+    assert stats["p95_ms"] is not None
+
+
+@pytest.mark.asyncio
+async def test_generate_retries_quota_errors_with_backoff():
+    """429s are retried until the call succeeds; other errors are not."""
+    # Arrange
+    governor = GeminiGovernor(timeout=5, max_retries=2, retry_backoff=0.001)
+    calls = 0
+
+    async def flaky(prompt, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise google_exceptions.TooManyRequests("quota")
+        return "ok"
+
+    async def broken(prompt, **kwargs):
+        raise ValueError("bad request")
+
+    # Act
+    result = await governor.generate(_model("gemini-2.5-flash", flaky), "prompt")
+    with pytest.raises(ValueError):
+        await governor.generate(_model("gemini-2.5-pro", broken), "prompt")
+
+    # Assert
+    assert result == "ok"
+    stats = governor.stats()["models"]
+    assert stats["gemini-2.5-flash"]["retries"] == 2
+    assert stats["gemini-2.5-pro"]["retries"] == 0 and stats["gemini-2.5-pro"]["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_generate_enforces_deadline():
+    """A response slower than the deadline raises TimeoutError."""
+    # Arrange
+    governor = GeminiGovernor(timeout=0.02)
+
+    async def slow(prompt, **kwargs):
+        await asyncio.sleep(1)
+
+    # Act / Assert
+    with pytest.raises(asyncio.TimeoutError):
+        await governor.generate(_model("gemini-2.5-pro", slow), "prompt")
+    assert governor.stats()["models"]["gemini-2.5-pro"]["timeouts"] == 1
+
+
+@pytest.mark.asyncio
+@patch('src.services.gemini_governor.config.GEMINI_HEDGING_ENABLED', True)
+async def test_generate_hedged_takes_the_faster_model():
+    """When pro exceeds its budget, a flash request is fired and its answer is used."""
+    # Arrange
+    governor = GeminiGovernor(timeout=5, hedge_after=0.01)
+    pro_cancelled = False
+
+    async def slow_pro(prompt, **kwargs):
+        nonlocal pro_cancelled
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            pro_cancelled = True
+            raise
+        return "pro"
+
+    async def fast_flash(prompt, **kwargs):
+        return "flash"
+
+    # Act
+    result = await governor.generate_hedged(
+        _model("gemini-2.5-pro", slow_pro), _model("gemini-2.5-flash", fast_flash), "prompt"
+    )
+    await asyncio.sleep(0.01)
+
+    # Assert
+    assert result == "flash"
+    assert pro_cancelled
+    assert governor.stats()["hedged"] == 1 and governor.stats()["hedge_wins"] == 1
+
+
+@pytest.mark.asyncio
+@patch('src.services.gemini_governor.config.GEMINI_HEDGING_ENABLED', True)
+async def test_generate_hedged_waits_for_latency_samples():
+    """Without a configured budget, hedging starts only once pro's p95 is known."""
+    # Arrange
+    governor = GeminiGovernor(timeout=5, hedge_after=0, min_hedge_samples=3)
+
+    async def pro(prompt, **kwargs):
+        return "pro"
+
+    flash = _model("gemini-2.5-flash", None)
+    pro_model = _model("gemini-2.5-pro", pro)
+
+    # Act
+    budget_before = governor.hedge_budget(pro_model)
+    for _ in range(3):
+        assert await governor.generate_hedged(pro_model, flash, "prompt") == "pro"
+
+    # Assert
+    assert budget_before is None
+    assert governor.hedge_budget(pro_model) is not None
+    assert governor.stats()["hedged"] == 0
+
+
+@pytest.mark.asyncio
+@patch('src.services.gemini_governor.config.GEMINI_PRO_CONCURRENCY', 1)
+async def test_streamed_calls_hold_their_slot_until_finished():
+    """A live stream counts against the model's limit and stays out of the hedge budget."""
+    # Arrange
+    governor = GeminiGovernor(timeout=5, min_hedge_samples=1)
+
+    async def chunks():
+        yield "a"
+        yield "b"
+
+    async def handler(prompt, **kwargs):
+        return chunks() if kwargs.get("stream") else prompt
+
+    model = _model("gemini-2.5-pro", handler)
+
+    # Act
+    stream = await governor.generate(model, "prompt", stream=True)
+    with pytest.raises(asyncio.TimeoutError):
+        await governor.generate(model, "blocked", timeout=0.02)
+    streamed = [chunk async for chunk in stream]
+    after = await governor.generate(model, "after")
+
+    # Assert
+    assert streamed == ["a", "b"]
+    assert after == "after"
+    stats = governor.stats()["models"]["gemini-2.5-pro"]
+    assert stats["in_flight"] == 0
+    assert len(governor._lane("gemini-2.5-pro").latencies) == 1
@@ -0,0 +1,76 @@
+import json
+import pytest
+from unittest.mock import patch
+
+from src.nlu.local_model import LocalIntentModel, evaluate, load_labels, log_label, main, tokenize
+from src.nlu.processor import classify_intent_and_extract_entities, nlu_cache
+
+EXAMPLES = [
+    ("how is the nft market looking", "get_market_trends"),
+    ("what's happening in the market today", "get_market_trends"),
+    ("give me the market overview", "get_market_trends"),
+    ("any market trends worth knowing", "get_market_trends"),
+    ("yo what's up", "greeting"),
+    ("good evening mira", "greeting"),
+    ("hello there friend", "greeting"),
+    ("hey hey", "greeting"),
+    ("tell me about azuki", "get_project_summary"),
+    ("what is the doodles project", "get_project_summary"),
+    ("details on pudgy penguins please", "get_project_summary"),
+    ("explain bored ape yacht club", "get_project_summary"),
+] * 3
+
+
+def test_tokenize_templates_numbers_and_addresses():
+    tokens = tokenize("Track 0x" + "ab" * 20 + " above 5.5")
+    assert "<addr>" in tokens and "<num>" in tokens
+    assert "track <addr>" in tokens
+
+
+def test_train_predict_and_round_trip(tmp_path):
+    """Test that a trained model predicts seen intents and survives save/load."""
+    model = LocalIntentModel.train(EXAMPLES, epochs=30)
+    intent, confidence = model.predict("how's the nft market today")
+    assert intent == "get_market_trends"
+    assert 0 < confidence <= 1
+
+    path = tmp_path / "model.json"
+    model.save(str(path))
+    loaded = LocalIntentModel.load(str(path))
+    assert loaded.predict("how's the nft market today") == (intent, pytest.approx(confidence))
+
+
+def test_label_log_and_cli(tmp_path, capsys):
+    """Test logging labels, training from the log and the offline evaluation report."""
+    log_path = tmp_path / "labels.jsonl"
+    for text, intent in EXAMPLES:
+        log_label(text, {"intent": intent, "entities": {}, "confidence": 0.95}, path=str(log_path))
+    log_label("ignored", {"intent": "unknown", "entities": {}, "confidence": 0.0}, path=str(log_path))
+
+    labels = load_labels(str(log_path))
+    assert len(labels) == 12
+    assert ("ignored", "unknown") not in labels
+
+    model_path = tmp_path / "model.json"
+    main(["train", "--logs", str(log_path), "--out", str(model_path), "--holdout", "0"])
+    main(["evaluate", "--logs", str(log_path), "--model", str(model_path), "--holdout", "1", "--min-confidence", "0"])
+    report = json.loads(capsys.readouterr().out.split("\n", 1)[1])
+
+    assert report["examples"] == 12
+    assert report["coverage"] == 1.0
+    assert report == evaluate(LocalIntentModel.load(str(model_path)), labels, 0)
+
+
+@pytest.mark.asyncio
+@patch('src.nlu.processor.config.NLU_FAST_PATH_ENABLED', False)
+@patch('src.nlu.processor.flash_model.generate_content_async')
+async def test_confident_local_model_skips_gemini(mock_flash):
+    """Test that confident local predictions for entity-free intents bypass Gemini."""
+    nlu_cache.clear()
+    model = LocalIntentModel.train(EXAMPLES, epochs=30)
+    with patch('src.nlu.processor.local_model', model), \
+            patch('src.nlu.processor.config.NLU_LOCAL_MODEL_MIN_CONFIDENCE', 0.5):
+        result = await classify_intent_and_extract_entities("how's the nft market today")
+
+    assert result['intent'] == 'get_market_trends'
+    mock_flash.assert_not_called()
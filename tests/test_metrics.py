@@ -0,0 +1,59 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.main import metrics_handler
+from src.metrics import endpoint_label, statement_label
+from src.services.notifications import NotificationDispatcher
+
+
+def test_endpoint_label_templates_ids():
+    """Addresses and numeric ids are replaced so each endpoint is one label value."""
+    assert endpoint_label("/collection/1/0xAbC123/metrics") == "/collection/{id}/{address}/metrics"
+    assert endpoint_label("/collections") == "/collections"
+
+
+def test_statement_label_is_the_sql_verb():
+    """Statements are labelled by their verb only."""
+    assert statement_label("\n  SELECT users.id FROM users") == "select"
+    assert statement_label("") == "unknown"
+
+
+def _scrape(secret: str):
+    request = MagicMock()
+    request.match_info = {"secret": secret}
+    return request
+
+
+@pytest.mark.asyncio
+@patch('src.main.config.METRICS_SECRET', "s3cret")
+async def test_metrics_handler_requires_the_secret():
+    """Scrapes without the metrics secret are rejected."""
+    response = await metrics_handler(_scrape("wrong"))
+    assert response.status == 401
+
+
+@pytest.mark.asyncio
+@patch('src.main.config.METRICS_SECRET', "s3cret")
+async def test_metrics_handler_serves_exposition_format():
+    """The /metrics handler returns every registered mira metric."""
+    # Arrange
+    dispatcher = NotificationDispatcher(MagicMock())
+    dispatcher._count("sent")
+
+    # Act
+    response = await metrics_handler(_scrape("s3cret"))
+
+    # Assert
+    body = response.body.decode()
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert 'mira_notifications_total{outcome="sent"}' in body
+    for name in (
+        "mira_handle_message_seconds",
+        "mira_gemini_request_seconds",
+        "mira_unleashnfts_request_seconds",
+        "mira_db_query_seconds",
+        "mira_scheduler_run_seconds",
+        "mira_alerts_triggered_total",
+    ):
+        assert name in body
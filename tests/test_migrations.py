@@ -0,0 +1,127 @@
+import os
+
+import pytest
+from sqlalchemy import inspect, select, text
+
+from src.database.manager import DatabaseManager
+from src.database.migrations import migrate
+from src.database.models import Base, Collection, PriceAlert, User
+
+# Set to an async Postgres URL (postgresql+asyncpg://...) to also check plans on Postgres.
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+EXPECTED_INDEXES = {
+    "price_alerts": {"ix_price_alerts_user_id", "ix_price_alerts_active_collection", "ix_price_alerts_active_id"},
+    "new_listing_alerts": {"ix_new_listing_alerts_user_id", "ix_new_listing_alerts_active_collection"},
+    "tracked_wallets": {"ix_tracked_wallets_user_id", "ix_tracked_wallets_active_address"},
+}
+
+
+async def _index_names(engine) -> dict[str, set]:
+    async with engine.connect() as conn:
+        return await conn.run_sync(lambda sync_conn: {
+            table: {index["name"] for index in inspect(sync_conn).get_indexes(table)}
+            for table in EXPECTED_INDEXES
+        })
+
+
+def _literal_sql(query, engine) -> str:
+    return str(query.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+
+
+@pytest.mark.asyncio
+async def test_migrate_adds_missing_indexes_without_dropping_data():
+    """Test that migrating a database created before the indexes keeps its rows and is idempotent."""
+    # Arrange
+    manager = DatabaseManager("sqlite+aiosqlite:///:memory:")
+    async with manager.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for names in EXPECTED_INDEXES.values():
+            for name in names:
+                await conn.execute(text(f"DROP INDEX {name}"))
+    user = await manager.get_or_create_user(123, "Test")
+
+    # Act
+    created = await migrate(manager.engine)
+    created_again = await migrate(manager.engine)
+
+    # Assert
+    assert set(created) == set().union(*EXPECTED_INDEXES.values())
+    assert created_again == []
+    indexes = await _index_names(manager.engine)
+    for table, names in EXPECTED_INDEXES.items():
+        assert names <= indexes[table]
+    async with manager.async_session() as session:
+        assert await session.scalar(select(User.id).filter_by(telegram_user_id=123)) == user.id
+    await manager.engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_scheduler_scan_uses_partial_index_on_sqlite():
+    """Test that SQLite plans the active-alert scan through the partial index."""
+    # Arrange
+    manager = DatabaseManager("sqlite+aiosqlite:///:memory:")
+    await manager.init_db()
+    query = DatabaseManager._active_price_alerts_query(0, 500)
+
+    # Act
+    async with manager.engine.connect() as conn:
+        plan = (await conn.execute(text("EXPLAIN QUERY PLAN " + _literal_sql(query, manager.engine)))).all()
+
+    # Assert
+    assert any("ix_price_alerts_active_id" in row[-1] for row in plan), plan
+    await manager.engine.dispose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL is not set")
+async def test_scheduler_scan_uses_partial_index_on_postgres():
+    """Test that Postgres can serve the active-alert scan from the partial index."""
+    # Arrange
+    manager = DatabaseManager(POSTGRES_URL)
+    await manager.init_db()
+    query = DatabaseManager._active_price_alerts_query(0, 500)
+
+    # Act
+    async with manager.engine.connect() as conn:
+        # Tiny test tables are cheaper to scan sequentially; ask whether the index is usable.
+        await conn.execute(text("SET enable_seqscan = off"))
+        plan = (await conn.execute(text("EXPLAIN " + _literal_sql(query, manager.engine)))).scalars().all()
+
+    # Assert
+    assert any("ix_price_alerts_active_id" in line for line in plan), plan
+    await manager.engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_migrate_links_legacy_alerts_to_collections():
+    """Test that alerts from before the collections table get a collection_id column and row."""
+    # Arrange
+    manager = DatabaseManager("sqlite+aiosqlite:///:memory:")
+    async with manager.engine.begin() as conn:
+        # The schema as it was before collections existed.
+        await conn.run_sync(lambda sync_conn: Base.metadata.create_all(
+            sync_conn, tables=[Base.metadata.tables["users"]]
+        ))
+        await conn.execute(text(
+            "CREATE TABLE price_alerts (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id), "
+            "collection_name VARCHAR NOT NULL, collection_address VARCHAR NOT NULL, chain VARCHAR NOT NULL, "
+            "threshold_price FLOAT NOT NULL, direction VARCHAR NOT NULL, is_active BOOLEAN, created_at DATETIME)"
+        ))
+        await conn.execute(text("INSERT INTO users (id, telegram_user_id, first_name) VALUES (1, 123, 'Test')"))
+        for address in ("0xABC", "0xABC", "0xdef"):
+            await conn.execute(text(
+                "INSERT INTO price_alerts (user_id, collection_name, collection_address, chain, threshold_price, direction, is_active) "
+                f"VALUES (1, 'Coll {address}', '{address}', 'ethereum', 1.0, 'below', 1)"
+            ))
+
+    # Act
+    await migrate(manager.engine)
+
+    # Assert
+    async with manager.async_session() as session:
+        collections = (await session.execute(select(Collection.chain, Collection.address))).all()
+        links = (await session.execute(select(PriceAlert.collection_id))).scalars().all()
+    assert sorted(collections) == [("1", "0xabc"), ("1", "0xdef")]
+    assert None not in links and len(set(links)) == 2
+    await manager.engine.dispose()
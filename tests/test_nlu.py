@@ -1,12 +1,21 @@
+import asyncio
 import pytest
 import json
 from unittest.mock import AsyncMock, patch
 
-from src.nlu.processor import classify_intent_and_extract_entities
+from src.nlu.processor import classify_intent_and_extract_entities, nlu_cache
+
+@pytest.fixture(autouse=True)
+def clear_nlu_cache():
+    """The NLU cache is module-level, so start every test with it empty."""
+    nlu_cache.clear()
+    yield
+    nlu_cache.clear()
 
 @pytest.mark.asyncio
 @patch('src.nlu.processor.model.generate_content_async')
-async def test_classify_summary_intent(mock_generate_content):
+@patch('src.nlu.processor.flash_model.generate_content_async')
+async def test_classify_summary_intent(mock_generate_content, mock_pro_generate_content):
     """Test classifying a 'get_project_summary' intent."""
     # Arrange
     user_input = "Tell me about the Bored Ape Yacht Club collection"
@@ -20,7 +29,8 @@ async def test_classify_summary_intent(mock_generate_content):
     })
     
     mock_gemini_response = AsyncMock()
-    mock_gemini_response.text = f"```json\n{mock_response_text}\n```"
+    # JSON mode returns the object directly, without markdown fences.
+    mock_gemini_response.text = mock_response_text
     mock_generate_content.return_value = mock_gemini_response
 
     # Act
@@ -31,9 +41,11 @@ async def test_classify_summary_intent(mock_generate_content):
     assert result['entities']['collection_name'] == 'Bored Ape Yacht Club'
     assert result['confidence'] == 0.95
     mock_generate_content.assert_called_once()
+    mock_pro_generate_content.assert_not_called()
 
 @pytest.mark.asyncio
-@patch('src.nlu.processor.model.generate_content_async')
+@patch('src.nlu.processor.config.NLU_FAST_PATH_ENABLED', False)
+@patch('src.nlu.processor.flash_model.generate_content_async')
 async def test_classify_price_alert_intent(mock_generate_content):
     """Test classifying a 'set_price_alert' intent with entities."""
     # Arrange
@@ -62,3 +74,188 @@ async def test_classify_price_alert_intent(mock_generate_content):
     assert result['entities']['threshold_price'] == 10
     assert result['entities']['direction'] == 'below'
     assert result['confidence'] == 0.98
+
+@pytest.mark.asyncio
+@patch('src.nlu.processor.flash_model.generate_content_async')
+async def test_fast_path_skips_gemini(mock_generate_content):
+    """Test that templated phrasings are classified locally without calling Gemini."""
+    # Act
+    result = await classify_intent_and_extract_entities("alert me when Doodles goes above 5 ETH")
+
+    # Assert
+    assert result['intent'] == 'set_price_alert'
+    assert result['entities'] == {"collection_name": "Doodles", "threshold_price": 5, "direction": "above"}
+    mock_generate_content.assert_not_called()
+
+def _gemini_response(payload: dict) -> AsyncMock:
+    response = AsyncMock()
+    response.text = json.dumps(payload)
+    return response
+
+@pytest.mark.asyncio
+@patch('src.nlu.processor.flash_model.generate_content_async')
+async def test_nlu_cache_hits_on_normalized_input(mock_generate_content):
+    """Test that casing and whitespace differences share one cached classification."""
+    # Arrange
+    mock_generate_content.return_value = _gemini_response({
+        "intent": "get_project_summary",
+        "entities": {"collection_name": "Bored Ape Yacht Club"},
+        "confidence": 0.95,
+        "reasoning": "Asking about a collection."
+    })
+
+    # Act
+    first = await classify_intent_and_extract_entities("Tell me about Bored Ape Yacht Club")
+    second = await classify_intent_and_extract_entities("  tell me ABOUT   bored ape yacht club ")
+
+    # Assert
+    assert first == second
+    mock_generate_content.assert_called_once()
+    assert nlu_cache.hits == 1
+
+@pytest.mark.asyncio
+@patch('src.nlu.processor.config.NLU_FAST_PATH_ENABLED', False)
+@patch('src.nlu.processor.flash_model.generate_content_async')
+async def test_nlu_cache_refills_templated_numbers(mock_generate_content):
+    """Test that a cached phrasing is reused with the new message's own number."""
+    # Arrange
+    mock_generate_content.return_value = _gemini_response({
+        "intent": "set_price_alert",
+        "entities": {"collection_name": "doodles", "threshold_price": 10, "direction": "below"},
+        "confidence": 0.98,
+        "reasoning": "Price threshold alert."
+    })
+
+    # Act
+    await classify_intent_and_extract_entities("ping me if doodles dips under 10 eth")
+    result = await classify_intent_and_extract_entities("ping me if doodles dips under 7.5 eth")
+
+    # Assert
+    mock_generate_content.assert_called_once()
+    assert result['entities']['threshold_price'] == 7.5
+    assert result['entities']['collection_name'] == 'doodles'
+    # One miss and one hit: each classification is counted once, not once per key tried.
+    assert (nlu_cache.misses, nlu_cache.hits) == (1, 1)
+
+@pytest.mark.asyncio
+@patch('src.nlu.processor.config.NLU_TIERED_ROUTING', False)
+@patch('src.nlu.processor.model.generate_content_async')
+async def test_nlu_cache_skips_error_results(mock_generate_content):
+    """Test that the 'unknown' error fallback is never cached."""
+    # Arrange
+    mock_generate_content.side_effect = Exception("quota exceeded")
+
+    # Act
+    first = await classify_intent_and_extract_entities("what do you think about floor sweeps")
+    second = await classify_intent_and_extract_entities("what do you think about floor sweeps")
+
+    # Assert
+    assert first['intent'] == second['intent'] == 'unknown'
+    assert mock_generate_content.call_count == 2
+    assert len(nlu_cache) == 0
+
+@pytest.mark.asyncio
+@patch('src.nlu.processor.model.generate_content_async')
+@patch('src.nlu.processor.flash_model.generate_content_async')
+async def test_low_confidence_flash_escalates_to_pro(mock_flash, mock_pro):
+    """Test that a low-confidence flash answer is re-classified by the pro model."""
+    # Arrange
+    mock_flash.return_value = _gemini_response({
+        "intent": "unknown", "entities": {}, "confidence": 0.4, "reasoning": "Unsure."
+    })
+    mock_pro.return_value = _gemini_response({
+        "intent": "set_new_listing_alert",
+        "entities": {"collection_name": "Azuki"},
+        "confidence": 0.9,
+        "reasoning": "Wants listing notifications."
+    })
+
+    # Act
+    result = await classify_intent_and_extract_entities("keep me posted on fresh azuki listings")
+
+    # Assert
+    assert result['intent'] == 'set_new_listing_alert'
+    mock_flash.assert_called_once()
+    mock_pro.assert_called_once()
+    assert mock_pro.call_args[1]['generation_config'].response_mime_type == "application/json"
+
+@pytest.mark.asyncio
+@patch('src.nlu.processor.model.generate_content_async')
+@patch('src.nlu.processor.flash_model.generate_content_async')
+async def test_invalid_flash_output_escalates_to_pro(mock_flash, mock_pro):
+    """Test that flash output failing schema validation escalates to pro."""
+    # Arrange
+    invalid = AsyncMock()
+    invalid.text = json.dumps({"intent": "buy_nft", "confidence": 0.99, "reasoning": "?"})
+    mock_flash.return_value = invalid
+    mock_pro.return_value = _gemini_response({
+        "intent": "get_project_summary",
+        "entities": {"collection_name": "Azuki"},
+        "confidence": 0.85,
+        "reasoning": "Asking about a collection."
+    })
+
+    # Act
+    result = await classify_intent_and_extract_entities("what's the deal with azuki")
+
+    # Assert
+    assert result['intent'] == 'get_project_summary'
+    mock_pro.assert_called_once()
+
+@pytest.mark.asyncio
+@patch('src.nlu.processor.config.NLU_BATCHING_ENABLED', True)
+@patch('src.nlu.processor.model.generate_content_async')
+@patch('src.nlu.processor.flash_model.generate_content_async')
+async def test_batched_classification(mock_flash, mock_pro):
+    """Test that concurrent requests are classified by one batched flash call."""
+    # Arrange
+    batch_response = AsyncMock()
+    batch_response.text = json.dumps([
+        {"index": 1, "intent": "get_project_summary", "entities": {"collection_name": "Azuki"},
+         "confidence": 0.9, "reasoning": "Collection question."},
+        {"index": 0, "intent": "get_market_trends", "entities": {},
+         "confidence": 0.92, "reasoning": "Market question."},
+    ])
+    mock_flash.return_value = batch_response
+
+    # Act
+    results = await asyncio.gather(
+        classify_intent_and_extract_entities("anything exciting happening in nfts lately"),
+        classify_intent_and_extract_entities("is azuki worth a look"),
+    )
+
+    # Assert
+    assert [r['intent'] for r in results] == ['get_market_trends', 'get_project_summary']
+    mock_flash.assert_called_once()
+    mock_pro.assert_not_called()
+
+@pytest.mark.asyncio
+@patch('src.nlu.processor.config.NLU_BATCHING_ENABLED', True)
+@patch('src.nlu.processor.model.generate_content_async')
+@patch('src.nlu.processor.flash_model.generate_content_async')
+async def test_batched_low_confidence_goes_straight_to_pro(mock_flash, mock_pro):
+    """Test that a low-confidence batch entry escalates to pro without a second flash call."""
+    # Arrange
+    batch_response = AsyncMock()
+    batch_response.text = json.dumps([
+        {"index": 0, "intent": "get_market_trends", "entities": {},
+         "confidence": 0.92, "reasoning": "Market question."},
+        {"index": 1, "intent": "get_market_trends", "entities": {},
+         "confidence": 0.3, "reasoning": "Not sure."},
+    ])
+    mock_flash.return_value = batch_response
+    mock_pro.return_value = _gemini_response({
+        "intent": "get_project_summary", "entities": {"collection_name": "Azuki"},
+        "confidence": 0.95, "reasoning": "Collection question."
+    })
+
+    # Act
+    results = await asyncio.gather(
+        classify_intent_and_extract_entities("anything exciting happening in nfts lately"),
+        classify_intent_and_extract_entities("is azuki worth a look"),
+    )
+
+    # Assert
+    assert [r['intent'] for r in results] == ['get_market_trends', 'get_project_summary']
+    mock_flash.assert_called_once()
+    mock_pro.assert_called_once()
@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from telegram.error import Forbidden, RetryAfter, TimedOut
+
+from src.services.notifications import NotificationDispatcher, TokenBucket
+
+
+def test_token_bucket_delay():
+    """Test that an empty bucket reports the time until its next token."""
+    with patch("src.services.notifications.time.monotonic", return_value=100.0):
+        bucket = TokenBucket(rate=2, capacity=1)
+        assert bucket.delay() == 0
+        bucket._tokens -= 1
+        assert bucket.delay() == pytest.approx(0.5)
+        bucket.pause(3)
+        assert bucket.delay() == pytest.approx(3)
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_delivers_and_calls_back():
+    """Test that queued messages are sent and acknowledged only on success."""
+    # Arrange
+    bot = MagicMock()
+    bot.send_message = AsyncMock()
+    delivered = []
+
+    # Act
+    async with NotificationDispatcher(bot, workers=2, global_rate=100, per_chat_rate=100) as dispatcher:
+        futures = [
+            dispatcher.send(chat_id, f"hello {chat_id}", on_delivered=lambda c=chat_id: delivered.append(c))
+            for chat_id in (1, 2, 3)
+        ]
+
+    # Assert
+    assert [f.result() for f in futures] == [True, True, True]
+    assert sorted(delivered) == [1, 2, 3]
+    assert bot.send_message.call_count == 3
+    assert dispatcher.stats["sent"] == 3
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_honors_retry_after():
+    """Test that a RetryAfter pauses sending and the message is retried."""
+    # Arrange
+    bot = MagicMock()
+    bot.send_message = AsyncMock(side_effect=[RetryAfter(0), None])
+    delivered = []
+
+    # Act
+    async with NotificationDispatcher(bot, workers=1, global_rate=100, per_chat_rate=100) as dispatcher:
+        future = dispatcher.send(1, "hello", on_delivered=lambda: delivered.append(1))
+
+    # Assert
+    assert future.result() is True
+    assert delivered == [1]
+    assert bot.send_message.call_count == 2
+    assert dispatcher.stats["rate_limited"] == 1
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_gives_up_after_bounded_retries():
+    """Test that transient failures are retried a bounded number of times."""
+    # Arrange
+    bot = MagicMock()
+    bot.send_message = AsyncMock(side_effect=TimedOut())
+    delivered, failed = [], []
+
+    # Act
+    async with NotificationDispatcher(
+        bot, workers=1, global_rate=100, per_chat_rate=100, max_retries=2, retry_backoff=0
+    ) as dispatcher:
+        future = dispatcher.send(
+            1, "hello", on_delivered=lambda: delivered.append(1), on_failed=lambda: failed.append(1)
+        )
+
+    # Assert
+    assert future.result() is False
+    assert bot.send_message.call_count == 3
+    assert delivered == []
+    assert failed == [1]
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_does_not_retry_forbidden():
+    """Test that permanent errors such as a blocked bot are not retried."""
+    bot = MagicMock()
+    bot.send_message = AsyncMock(side_effect=Forbidden("bot was blocked by the user"))
+
+    async with NotificationDispatcher(bot, workers=1, global_rate=100, per_chat_rate=100) as dispatcher:
+        future = dispatcher.send(1, "hello")
+
+    assert future.result() is False
+    assert bot.send_message.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_per_chat_rate_limit():
+    """Test that messages to one chat are spaced by the per-chat rate."""
+    bot = MagicMock()
+    sent_at = []
+
+    async def send_message(chat_id, text):
+        sent_at.append(asyncio.get_running_loop().time())
+
+    bot.send_message = send_message
+
+    async with NotificationDispatcher(bot, workers=2, global_rate=100, per_chat_rate=20) as dispatcher:
+        for _ in range(3):
+            dispatcher.send(1, "hello")
+
+    assert len(sent_at) == 3
+    assert sent_at[2] - sent_at[0] >= 0.09
@@ -0,0 +1,74 @@
+from unittest.mock import MagicMock
+
+from src.services.prompt_builder import (
+    SUMMARY_PROMPT_PREFIX,
+    build_summary_prompt,
+    log_prompt_tokens,
+    project_metrics,
+)
+
+
+def test_project_metrics_keeps_summary_fields_in_priority_order():
+    """Only name, floor, volume, holders and trend fields survive, most important first."""
+    # Arrange
+    payload = {
+        "metadata": {"name": "Doodles", "contract_address": "0x123", "banner_image_url": "https://..."},
+        "metric_values": {
+            "holders": {"value": 5000, "unit": "count"},
+            "volume": {"value": 123.456789123, "unit": "eth"},
+            "volume_change": {"value": -0.12},
+            "floor_price": {"value": 1.2},
+        },
+        "description": "A long marketing description " * 20,
+    }
+
+    # Act
+    projected = project_metrics(payload)
+
+    # Assert
+    assert list(projected.items()) == [
+        ("name", "Doodles"),
+        ("floor_price", 1.2),
+        ("volume", 123.457),
+        ("volume_unit", "eth"),
+        ("volume_change", -0.12),
+        ("holders", 5000),
+        ("holders_unit", "count"),
+    ]
+
+
+def test_build_summary_prompt_is_compact():
+    """The data is serialized without whitespace after the precomputed static text."""
+    # Act
+    prompt, estimated = build_summary_prompt({"stats": {"floor_price": 1.5, "volume": 10}})
+
+    # Assert
+    assert prompt.startswith(SUMMARY_PROMPT_PREFIX)
+    assert '{"floor_price":1.5,"volume":10}' in prompt
+    assert estimated > 0
+
+
+def test_build_summary_prompt_drops_low_priority_fields_to_fit_budget():
+    """When over budget, trend fields go before floor price."""
+    # Arrange
+    payload = {"floor_price": 1.5, **{f"trend_{i}_change": i for i in range(50)}}
+    _, unbounded = build_summary_prompt(payload, token_budget=10_000)
+
+    # Act
+    prompt, estimated = build_summary_prompt(payload, token_budget=unbounded - 50)
+
+    # Assert
+    assert estimated <= unbounded - 50
+    assert '"floor_price":1.5' in prompt
+    assert "trend_49_change" not in prompt
+
+
+def test_log_prompt_tokens_reads_usage_metadata():
+    """The measured prompt token count comes from the response's usage metadata."""
+    # Arrange
+    response = MagicMock()
+    response.usage_metadata.prompt_token_count = 87
+
+    # Act / Assert
+    assert log_prompt_tokens("Summary", 90, response) == 87
+    assert log_prompt_tokens("Summary", 90, object()) is None
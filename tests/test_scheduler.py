@@ -1,9 +1,10 @@
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
 from telegram.ext import Application
 from sqlalchemy import select
 
-from src.scheduler import check_price_alerts
+from src.scheduler import check_price_alerts, AlertRunCoordinator
 from src.database.manager import DatabaseManager
 from src.database.models import User, PriceAlert
 
@@ -40,6 +41,27 @@ async def db_manager_with_alerts():
     manager.add_user_and_alert = _add_user_and_alert
     return manager
 
+@pytest.mark.asyncio
+@patch('src.scheduler.unleash_nfts_service.get_collection_metrics')
+async def test_check_price_alerts_sees_alerts_from_other_processes(mock_get_metrics, db_manager_with_alerts):
+    """Test that each run reloads active alerts, including ones this process never indexed."""
+    # Arrange
+    mock_get_metrics.return_value = {"floor_price": 9.5}
+    mock_app = MagicMock(spec=Application)
+    mock_app.bot.send_message = AsyncMock()
+    with patch('src.scheduler.db_manager', db_manager_with_alerts):
+        first = await check_price_alerts(mock_app)
+        # Written straight to the database, as another instance would.
+        await db_manager_with_alerts.add_user_and_alert(123, "Doodles", "0x123", "ethereum", 10.0, "below")
+
+        # Act
+        second = await check_price_alerts(mock_app)
+
+    # Assert
+    assert first["alerts"] == 0
+    assert second["alerts"] == 1 and second["triggered"] == 1
+    mock_app.bot.send_message.assert_called_once()
+
 @pytest.mark.asyncio
 @patch('src.scheduler.unleash_nfts_service.get_collection_metrics')
 async def test_check_price_alerts_below_triggered(mock_get_metrics, db_manager_with_alerts):
@@ -152,3 +174,137 @@ async def test_check_price_alerts_only_active(mock_get_metrics, db_manager_with_
     mock_app.bot.send_message.assert_called_once() # Only the active alert should trigger
     call_args = mock_app.bot.send_message.call_args
     assert call_args[1]['chat_id'] == 222
+
+@pytest.mark.asyncio
+@patch('src.scheduler.unleash_nfts_service.get_collection_metrics')
+async def test_check_price_alerts_fetches_each_collection_once(mock_get_metrics, db_manager_with_alerts):
+    """Test that alerts on the same collection share one metrics request."""
+    # Arrange
+    await db_manager_with_alerts.add_user_and_alert(1, "Doodles", "0x123", "ethereum", 10.0, "below")
+    await db_manager_with_alerts.add_user_and_alert(2, "Doodles", "0x123", "ethereum", 12.0, "below")
+    await db_manager_with_alerts.add_user_and_alert(3, "Doodles", "0x123", "ethereum", 5.0, "below")
+    await db_manager_with_alerts.add_user_and_alert(4, "Azuki", "0x789", "ethereum", 1.0, "above")
+    mock_get_metrics.return_value = {"floor_price": 9.5}
+    mock_app = MagicMock(spec=Application)
+    mock_app.bot.send_message = AsyncMock()
+
+    # Act
+    with patch('src.scheduler.db_manager', db_manager_with_alerts):
+        stats = await check_price_alerts(mock_app)
+
+    # Assert
+    assert mock_get_metrics.call_count == 2
+    assert stats["alerts"] == 4
+    assert stats["collections"] == 2
+    assert stats["fan_out"] == 2.0
+    assert stats["triggered"] == 3
+    notified = {call[1]['chat_id'] for call in mock_app.bot.send_message.call_args_list}
+    assert notified == {1, 2, 4}
+
+@pytest.mark.asyncio
+@patch('src.scheduler.unleash_nfts_service.get_collection_metrics')
+async def test_check_price_alerts_fetches_concurrently_with_limit(mock_get_metrics, db_manager_with_alerts):
+    """Test that metrics fetches overlap but never exceed the concurrency limit."""
+    # Arrange
+    for i in range(6):
+        await db_manager_with_alerts.add_user_and_alert(i, f"Collection {i}", f"0x{i}", "ethereum", 10.0, "below")
+
+    in_flight = 0
+    peak = 0
+
+    async def slow_metrics(blockchain, address):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"floor_price": 20.0}
+
+    mock_get_metrics.side_effect = slow_metrics
+    mock_app = MagicMock(spec=Application)
+    mock_app.bot.send_message = AsyncMock()
+
+    # Act
+    with patch('src.scheduler.db_manager', db_manager_with_alerts), \
+            patch('src.scheduler.config.ALERT_FETCH_CONCURRENCY', 3):
+        await check_price_alerts(mock_app)
+
+    # Assert
+    assert mock_get_metrics.call_count == 6
+    assert peak == 3
+
+@pytest.mark.asyncio
+@patch('src.scheduler.unleash_nfts_service.get_collection_metrics')
+async def test_check_price_alerts_fetch_timeout(mock_get_metrics, db_manager_with_alerts):
+    """Test that a slow metrics request times out without blocking other collections."""
+    # Arrange
+    await db_manager_with_alerts.add_user_and_alert(1, "Slow", "0xslow", "ethereum", 10.0, "below")
+    await db_manager_with_alerts.add_user_and_alert(2, "Fast", "0xfast", "ethereum", 10.0, "below")
+
+    async def metrics(blockchain, address):
+        if address == "0xslow":
+            await asyncio.sleep(10)
+        return {"floor_price": 9.0}
+
+    mock_get_metrics.side_effect = metrics
+    mock_app = MagicMock(spec=Application)
+    mock_app.bot.send_message = AsyncMock()
+
+    # Act
+    with patch('src.scheduler.db_manager', db_manager_with_alerts), \
+            patch('src.scheduler.config.ALERT_FETCH_TIMEOUT_SECONDS', 0.05):
+        stats = await check_price_alerts(mock_app)
+
+    # Assert
+    assert stats["triggered"] == 1
+    assert stats["alerts"] == 2 and stats["evaluated"] == 1
+    mock_app.bot.send_message.assert_called_once()
+    assert mock_app.bot.send_message.call_args[1]['chat_id'] == 2
+
+@pytest.mark.asyncio
+async def test_run_coordinator_coalesces_overlapping_triggers():
+    """Test that triggers during a run collapse into exactly one follow-up run."""
+    # Arrange
+    release = asyncio.Event()
+    started = 0
+
+    async def fake_run(app):
+        nonlocal started
+        started += 1
+        await release.wait()
+        return {"triggered": 0}
+
+    coordinator = AlertRunCoordinator(run=fake_run)
+    mock_app = MagicMock(spec=Application)
+
+    # Act
+    first = coordinator.trigger(mock_app)
+    await asyncio.sleep(0)
+    second = coordinator.trigger(mock_app)
+    third = coordinator.trigger(mock_app)
+    release.set()
+    await coordinator._task
+
+    # Assert
+    assert first["running"] and not first["queued"]
+    assert second["queued"] and third["queued"]
+    assert started == 2
+    status = coordinator.status()
+    assert status["running"] is False
+    assert status["queued"] is False
+    assert status["runs"] == 2
+    assert status["last_duration"] is not None
+
+@pytest.mark.asyncio
+async def test_run_coordinator_cancel():
+    """Test that cancelling the coordinator stops the active run."""
+    async def fake_run(app):
+        await asyncio.sleep(10)
+
+    coordinator = AlertRunCoordinator(run=fake_run)
+    coordinator.trigger(MagicMock(spec=Application))
+    await asyncio.sleep(0)
+
+    await coordinator.cancel()
+
+    assert not coordinator.running
@@ -1,8 +1,16 @@
+import asyncio
 import pytest
 import respx
 from httpx import Response
 
-from src.services.unleashnfts_api import unleash_nfts_service, BASE_URL
+from src.services.unleashnfts_api import UnleashNFTsService, unleash_nfts_service, BASE_URL
+
+@pytest.fixture(autouse=True)
+def clear_metrics_cache():
+    """The service is a module-level singleton, so reset its response cache per test."""
+    unleash_nfts_service.metrics_cache.clear()
+    yield
+    unleash_nfts_service.metrics_cache.clear()
 
 @pytest.mark.asyncio
 @respx.mock
@@ -98,3 +106,49 @@ async def test_search_collection_not_found():
 
     # Assert
     assert result is None
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_requests_share_one_pooled_client():
+    """Test that consecutive requests reuse the service's long-lived client."""
+    # Arrange
+    service = UnleashNFTsService()
+    await service.start()
+    client = service._client
+    respx.get(f"{BASE_URL}/market/trend").mock(return_value=Response(200, json={"trend": "up"}))
+
+    # Act
+    await service.get_market_trends()
+    await service.get_market_trends()
+
+    # Assert
+    assert service._client is client
+    assert not client.is_closed
+
+    await service.close()
+    assert client.is_closed
+    assert service._client is None
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_get_collection_metrics_coalesces_and_caches():
+    """Test that concurrent and repeated metrics requests share one upstream call."""
+    # Arrange
+    blockchain = 1
+    address = "0xbd49448e92423253930b3310a5563539a68e643e"
+    route = respx.get(f"{BASE_URL}/collection/{blockchain}/{address}/metrics", params={"metrics": "volume"}).mock(
+        return_value=Response(200, json={"floor_price": 2.5})
+    )
+
+    # Act
+    results = await asyncio.gather(
+        *(unleash_nfts_service.get_collection_metrics(blockchain, address) for _ in range(5))
+    )
+    cached = await unleash_nfts_service.get_collection_metrics(blockchain, address.upper())
+
+    # Assert
+    assert all(result == {"floor_price": 2.5} for result in results)
+    assert cached == {"floor_price": 2.5}
+    assert route.call_count == 1